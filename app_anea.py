@@ -1,18 +1,8 @@
-from dis import show_code
-from http import server
-from operator import le
-from textwrap import shorten
 import streamlit as st
-import geopandas as gpd
-
-from IPython.core.display import display, HTML
 
 import folium
 from streamlit_folium import folium_static
 
-from sklearn.preprocessing import MinMaxScaler
-import plotly.express as px
-
 import numpy as np
 import os
 import pandas as pd
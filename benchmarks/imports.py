@@ -0,0 +1,64 @@
+"""
+Measures the import time of the modules of the app in a fresh interpreter with python -X importtime
+Usage: python -m benchmarks.imports [--modules best_restaurant_location.stages ...] [--repeat 5] [--top 15]
+"""
+import argparse
+import re
+import subprocess
+import sys
+
+import pandas as pd
+
+# Modules imported by app.py before its first rerun can run
+APP_MODULES = ['streamlit', 'pandas',
+               'best_restaurant_location.stages', 'best_restaurant_location.warmup',
+               'best_restaurant_location.watcher', 'best_restaurant_location.access_log',
+               'best_restaurant_location.profiling', 'best_restaurant_location.memory']
+
+# Heavy modules the app only imports on the code path that needs them, or not at all
+# (streamlit itself imports plotly when it is installed)
+DEFERRED_MODULES = ['sklearn', 'scipy.spatial', 'pydeck', 'streamlit_folium', 'geopandas', 'IPython']
+
+LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def import_times(modules):
+    """
+    Imports modules in a fresh interpreter and returns one row per imported module with its own and
+    cumulative import time in ms, level 0 being the modules imported directly by the statement
+    or by the interpreter itself, and the set of all modules loaded
+    """
+    statement = f'import sys; import {", ".join(modules)}; print(" ".join(sys.modules))'
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                             capture_output=True, text=True, check=True)
+    rows = []
+    for line in process.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            rows.append({'module': match.group(4),
+                         'self_ms': int(match.group(1)) / 1000,
+                         'cumulative_ms': int(match.group(2)) / 1000,
+                         'level': (len(match.group(3)) - 1) // 2})
+    return pd.DataFrame(rows), set(process.stdout.split())
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--modules', nargs='+', default=APP_MODULES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    # the first run also fills the bytecode caches, the median of the next ones is reported
+    runs = [import_times(args.modules) for _ in range(args.repeat + 1)][1:]
+    totals = [df.loc[df['level']==0, 'cumulative_ms'].sum() for df, loaded in runs]
+    df, loaded = runs[-1]
+
+    print(f'import of {", ".join(args.modules)}: {pd.Series(totals).median():.0f} ms '
+          f'(median of {args.repeat}), {len(loaded)} modules loaded\n')
+    packages = df[df['level']==0].sort_values('cumulative_ms', ascending=False).head(args.top)
+    print(packages[['module', 'cumulative_ms']].to_string(index=False))
+    print('\ndeferred modules loaded at import: '
+          f'{[module for module in DEFERRED_MODULES if module in loaded] or "none"}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Performance regression gate: times the filter, the scoring and the map builds the app runs on the Geneva
+dataset and compares their median latency and peak memory with the committed baseline, exits with 1 on a
+regression
+Usage: python -m benchmarks.regression [--threshold 0.25] [--memory-threshold 0.1] [--update]
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+from best_restaurant_location.dataset import build_from_csv
+from best_restaurant_location.maps import build_location_map, render_map
+from best_restaurant_location.params import path_data, path_cluster_centers, path_district
+from best_restaurant_location.scoring import pick_location
+from best_restaurant_location.stages import dict_map_builders, map_view
+
+path_baseline = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# Selections (district, main category, sub category) of the gated cases
+SELECTIONS = {'all': ('All', 'All', 'All'),
+              'district': ('Cité-Centre', 'All', 'All'),
+              'cuisine': ('All', 'Asian', 'Thai')}
+
+WEIGHTS = (2, 2, 2)
+
+
+def cases():
+    """
+    Returns the gated computations by name, each called the way the stages of the app call it
+    """
+    dataset = build_from_csv(path_data, path_cluster_centers, path_district)
+    data, df_cluster_centers = dataset.data, dataset.cluster_centers
+
+    dict_cases = {}
+    for label, selection in SELECTIONS.items():
+        dict_cases[f'filter[{label}]'] = lambda selection=selection: dataset.filter(*selection)
+        dict_cases[f'pick_location[{label}]'] = \
+            lambda selection=selection: pick_location(data, *selection, *WEIGHTS, df_cluster_centers,
+                                                      dataset.aggregate)
+
+    # maps are built with compact markers whatever BRL_COMPACT_MAPS says, so that runs compare
+    df = dataset.filter(*SELECTIONS['all'])
+    location, zoom = map_view(dataset.districts, 'All')
+    for name, build in dict_map_builders.items():
+        dict_cases[f'build_map_{name}[all]'] = lambda build=build: render_map(build(df, location, zoom, True))
+    best_locations, worst_locations = pick_location(data, *SELECTIONS['all'], *WEIGHTS, df_cluster_centers,
+                                                    dataset.aggregate)
+    dict_cases['build_map_location[all]'] = \
+        lambda: render_map(build_location_map(data, best_locations, worst_locations, 'All', location, zoom, True,
+                                              dataset.hulls))
+    return dict_cases
+
+def measure(function, rounds):
+    """
+    Returns the median wall time in ms of rounds calls of function, after one warm-up call,
+    and the peak memory in bytes traced during one more call
+    """
+    function()
+    ms = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        function()
+        ms.append((time.perf_counter() - start) * 1000)
+
+    # garbage left by the timed calls would otherwise be collected during the traced one
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'median_ms': round(statistics.median(ms), 3), 'peak_bytes': peak}
+
+def run(dict_cases, rounds, results=None):
+    """
+    Measures the cases, keeping the lowest median and peak of this run and of earlier results
+    """
+    results = dict(results or {})
+    for name, function in dict_cases.items():
+        current = measure(function, rounds)
+        if name in results:
+            current = {metric: min(value, results[name][metric]) for metric, value in current.items()}
+        results[name] = current
+        print(f'{name}: {results[name]}', file=sys.stderr, flush=True)
+    return results
+
+def machine():
+    return {'python': platform.python_version(), 'pandas': pd.__version__, 'machine': platform.machine(),
+            'processor': platform.processor(), 'system': platform.system()}
+
+def compare(baseline, results, threshold, memory_threshold):
+    """
+    Returns one row per case and metric with the baseline and current values, the relative change and
+    whether it regressed past its threshold
+    """
+    rows = []
+    for name, current in results.items():
+        for metric, limit in (('median_ms', threshold), ('peak_bytes', memory_threshold)):
+            base = baseline.get(name, {}).get(metric)
+            change = None if not base else current[metric] / base - 1
+            rows.append({'case': name,
+                         'metric': metric,
+                         'baseline': base,
+                         'current': current[metric],
+                         'change': 'new' if change is None else f'{change:+.1%}',
+                         'regressed': change is not None and change > limit})
+    return pd.DataFrame(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description='Fails when the filter, the scoring or a map build got slower '
+                                                 'or bigger than in the baseline')
+    parser.add_argument('--baseline', default=path_baseline)
+    parser.add_argument('--threshold', type=float, default=float(os.environ.get('BRL_PERF_THRESHOLD', 0.25)),
+                        help='largest accepted relative increase of the median latency')
+    parser.add_argument('--memory-threshold', type=float,
+                        default=float(os.environ.get('BRL_PERF_MEMORY_THRESHOLD', 0.1)),
+                        help='largest accepted relative increase of the peak memory')
+    parser.add_argument('--rounds', type=int, default=30)
+    parser.add_argument('--retries', type=int, default=2,
+                        help='times the regressed cases are measured again, to tell them from a busy machine')
+    parser.add_argument('--update', action='store_true', help='writes the results as the new baseline')
+    args = parser.parse_args()
+
+    dict_cases = cases()
+    results = run(dict_cases, args.rounds)
+
+    if args.update:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'machine': machine(), 'results': results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'baseline written to {args.baseline}')
+        return
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline['machine'] != machine():
+        print(f'warning: the baseline was measured on {baseline["machine"]}, latencies may not compare')
+
+    df = compare(baseline['results'], results, args.threshold, args.memory_threshold)
+    for _ in range(args.retries):
+        regressed = set(df.loc[df['regressed'], 'case'])
+        if not regressed:
+            break
+        results = run({name: dict_cases[name] for name in regressed}, args.rounds, results)
+        df = compare(baseline['results'], results, args.threshold, args.memory_threshold)
+    print(df.to_string(index=False, float_format='{:,.1f}'.format))
+
+    regressions = df[df['regressed']]
+    if len(regressions):
+        print(f'\n{len(regressions)} regression(s) past +{args.threshold:.0%} latency / '
+              f'+{args.memory_threshold:.0%} memory')
+        sys.exit(1)
+    print(f'\nno regression past +{args.threshold:.0%} latency / +{args.memory_threshold:.0%} memory')
+
+if __name__ == '__main__':
+    main()
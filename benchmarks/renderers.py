@@ -0,0 +1,60 @@
+"""
+Compares the map renderers on growing numbers of restaurants
+Usage: python -m benchmarks.renderers [--sizes 1000 10000 100000]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from best_restaurant_location.decks import build_deck
+from best_restaurant_location.maps import build_price_map, render_map, restaurant_popup_html
+from best_restaurant_location.params import dict_bins
+
+LOCATION = [46.20496, 6.14299]
+ZOOM = 13.4
+
+
+def resample(data, n, seed=0):
+    """
+    Draws n restaurants from data, moving every copy by up to ~100 m so the points do not overlap
+    """
+    rng = np.random.default_rng(seed)
+    df = data.iloc[rng.integers(0, len(data), n)].reset_index(drop=True)
+    df['geometry.location.lat'] += rng.uniform(-0.001, 0.001, n)
+    df['geometry.location.lng'] += rng.uniform(-0.001, 0.001, n)
+    return df
+
+def timed(function):
+    start = time.perf_counter()
+    payload = function()
+    return time.perf_counter() - start, len(payload.encode('utf-8'))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--data', default='data/data_combined_v1.05.csv')
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.data)
+    data['popup_html'] = restaurant_popup_html(data)
+
+    renderers = {
+        'folium': lambda df: render_map(build_price_map(df, LOCATION, ZOOM)),
+        'folium compact': lambda df: render_map(build_price_map(df, LOCATION, ZOOM, compact=True)),
+        'pydeck': lambda df: build_deck(df, LOCATION, ZOOM, dict_bins['price']).to_json(),
+    }
+
+    rows = []
+    for n in args.sizes:
+        df = resample(data, n)
+        for name, render in renderers.items():
+            seconds, size = timed(lambda: render(df))
+            rows.append({'restaurants': n, 'renderer': name, 'seconds': round(seconds, 3), 'bytes': size})
+            print(rows[-1], flush=True)
+
+    print(pd.DataFrame(rows).pivot(index='restaurants', columns='renderer', values=['seconds', 'bytes']))
+
+if __name__ == '__main__':
+    main()
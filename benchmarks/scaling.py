@@ -0,0 +1,117 @@
+"""
+Charts the latency and peak memory of the stages of the app on synthetic cities of growing size, each city
+compiled into a bundle and memory-mapped like the app loads it
+Usage: python -m benchmarks.scaling [--sizes 1000 10000 100000 1000000] [--out scaling.csv] [--chart scaling.html]
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from best_restaurant_location.chunked import write_bundle_chunked
+from best_restaurant_location.dataset import load_bundle
+from best_restaurant_location.maps import build_overview_map, render_map
+from best_restaurant_location.params import bundle_chunksize
+from best_restaurant_location.scoring import pick_location
+from best_restaurant_location.synthetic import generate_city, write_city
+
+WEIGHTS = (2, 2, 2)
+ZOOM = 13.4
+
+
+def measure(function, repeat):
+    """
+    Returns the best wall time of repeat calls of function, and the peak memory traced during one more call
+    """
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        seconds.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return min(seconds), peak
+
+def stages(bundle, map_limit):
+    """
+    Returns the stages to measure on the bundle compiled in directory bundle, by name, each called the way
+    the stages of the app call it
+    """
+    dataset = load_bundle(bundle)
+    data, df_cluster_centers, df_district = dataset.data, dataset.cluster_centers, dataset.districts
+    location = df_district.loc[0, ['district_lat', 'district_lng']].tolist()
+    district = df_district.loc[1, 'district']
+
+    def pick(*selection):
+        return lambda: pick_location(data, *selection, *WEIGHTS, df_cluster_centers, dataset.aggregate)
+
+    dict_stages = {
+        'load_bundle': lambda: load_bundle(bundle),
+        'filter all': lambda: dataset.filter('All', 'All', 'All'),
+        'filter cuisine': lambda: dataset.filter('All', 'Asian', 'Thai'),
+        'pick_location all': pick('All', 'All', 'All'),
+        'pick_location district': pick(district, 'All', 'All'),
+        'pick_location cuisine': pick('All', 'Asian', 'Thai'),
+    }
+    if len(data) <= map_limit:
+        df = dataset.filter('All', 'All', 'All')
+        dict_stages['map overview'] = lambda: render_map(build_overview_map(df, location, ZOOM, compact=True))
+    return dict_stages
+
+def chart(df, path):
+    """
+    Writes the latency and memory curves as an html chart, log scales on both axes
+    """
+    from plotly.subplots import make_subplots
+    import plotly.graph_objects as go
+
+    figure = make_subplots(rows=1, cols=2, subplot_titles=['seconds', 'peak MB'])
+    for col, value in enumerate(['seconds', 'peak_mb'], start=1):
+        for stage, df_stage in df.groupby('stage'):
+            figure.add_trace(go.Scatter(x=df_stage['restaurants'], y=df_stage[value], name=stage,
+                                        legendgroup=stage, showlegend=col==1), row=1, col=col)
+    figure.update_xaxes(type='log', title='restaurants')
+    figure.update_yaxes(type='log')
+    figure.write_html(path)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--districts', type=int, default=10)
+    parser.add_argument('--clusters', type=int, default=36)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--map-limit', type=int, default=100000,
+                        help='largest city whose map is built, maps of more restaurants do not fit in a browser')
+    parser.add_argument('--out', help='csv file of the measures')
+    parser.add_argument('--chart', help='html file of the chart of the measures')
+    args = parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for n in args.sizes:
+            paths = write_city(directory, *generate_city(n, args.districts, args.clusters))
+            bundle = os.path.join(directory, f'bundle_{n}')
+            write_bundle_chunked(paths, bundle, f'{n}', bundle_chunksize)
+            for stage, function in stages(bundle, args.map_limit).items():
+                seconds, peak = measure(function, args.repeat)
+                rows.append({'restaurants': n, 'stage': stage, 'seconds': round(seconds, 4),
+                             'peak_mb': round(peak / 2**20, 2)})
+                print(rows[-1], flush=True)
+
+    df = pd.DataFrame(rows)
+    print(df.pivot(index='stage', columns='restaurants', values=['seconds', 'peak_mb']).to_string())
+    if args.out:
+        df.to_csv(args.out, index=False)
+    if args.chart:
+        chart(df, args.chart)
+
+if __name__ == '__main__':
+    main()
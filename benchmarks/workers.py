@@ -0,0 +1,88 @@
+"""
+Measures the memory of several worker processes holding the same dataset, built from the csv files
+by every worker or memory-mapped from one bundle published in shared memory (Linux only)
+Usage: python -m benchmarks.workers [--restaurants 200000] [--workers 1 2 4 8] [--shared-dir /dev/shm]
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+
+import pandas as pd
+
+from best_restaurant_location.synthetic import generate_city, write_city
+
+SELECTIONS = [('All', 'All', 'All'), ('All', 'Asian', 'Thai')]
+WEIGHTS = (2, 2, 2)
+
+
+def memory():
+    """
+    Returns the Rss, Pss and private memory of the current process in MB
+    Pss counts every shared page divided by the number of processes mapping it
+    """
+    fields = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return {'rss': fields['Rss'], 'pss': fields['Pss'],
+            'private': fields['Private_Clean'] + fields['Private_Dirty']}
+
+def worker(mode, paths, bundle, barrier, results):
+    from best_restaurant_location.dataset import build_from_csv, load_bundle
+    from best_restaurant_location.scoring import pick_location
+
+    before = memory()
+    dataset = load_bundle(bundle) if mode == 'bundle' else build_from_csv(*paths)
+    # what a session does with the data: filter, score and read the popups of the maps
+    for selection in SELECTIONS:
+        dataset.filter(*selection)
+        pick_location(dataset.data, *selection, *WEIGHTS, dataset.cluster_centers, dataset.aggregate)
+    dataset.data['popup_html'].str.len().sum()
+
+    # every worker holds its dataset while the others measure
+    barrier.wait()
+    after = memory()
+    results.put({'private': after['private'] - before['private'], 'pss': after['pss']})
+    barrier.wait()
+
+def run(mode, n, paths, bundle):
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(n)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(mode, paths, bundle, barrier, results)) for _ in range(n)]
+    for process in processes:
+        process.start()
+    measures = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return {'mode': mode, 'workers': n,
+            'dataset private MB per worker': round(sum(m['private'] for m in measures) / n, 1),
+            'total Pss MB': round(sum(m['pss'] for m in measures), 1)}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--restaurants', type=int, default=200000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--shared-dir', default='/dev/shm' if os.path.isdir('/dev/shm') else None,
+                        help='where the loader publishes the bundle, a tmpfs keeps it in memory')
+    args = parser.parse_args()
+
+    from best_restaurant_location.dataset import compile_bundle
+
+    rows = []
+    with tempfile.TemporaryDirectory() as directory, tempfile.TemporaryDirectory(dir=args.shared_dir) as shared:
+        paths = write_city(directory, *generate_city(args.restaurants))
+        # the loader: compiles once, the workers only map the files
+        bundle = compile_bundle(paths, shared)
+        for mode in ['csv', 'bundle']:
+            for n in args.workers:
+                rows.append(run(mode, n, paths, bundle))
+                print(rows[-1], flush=True)
+
+    print(pd.DataFrame(rows).to_string(index=False))
+
+if __name__ == '__main__':
+    main()
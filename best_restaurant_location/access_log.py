@@ -0,0 +1,153 @@
+import argparse
+import json
+import logging
+import os
+import queue
+import threading
+
+import pandas as pd
+
+from best_restaurant_location.params import path_access_log, access_log_enabled, default_city
+
+logger = logging.getLogger(__name__)
+
+
+class AccessLog:
+    """
+    Append-only log of the selections made in the app, one json object per line
+    Entries are queued and written by a background thread, so writing never delays a rerun
+    """
+    def __init__(self, path):
+        self.path = path
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def write(self, entry):
+        """
+        Queues an entry, starting the writer thread on first use
+        """
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='access-log', daemon=True)
+                self.thread.start()
+        self.queue.put(entry)
+
+    def run(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        while True:
+            entries = [self.queue.get()]
+            # writes whatever else arrived meanwhile in the same append
+            while not self.queue.empty():
+                entries.append(self.queue.get_nowait())
+            try:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries))
+            except OSError:
+                logger.exception('could not write %d access log entries to %s', len(entries), self.path)
+
+def read_entries(path):
+    """
+    Returns the entries of the access log, skipping a line still being written
+    Raises FileNotFoundError or ValueError with the reason when there is nothing to summarize
+    """
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f'no access log at {path}, the app writes it unless BRL_ACCESS_LOG_ENABLED=0')
+    entries = []
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if 'stages' not in entry:
+                raise ValueError(f'{path}:{number} has no stages, it is not an access log of this version of the app')
+            entries.append(entry)
+    if not entries:
+        raise ValueError(f'{path} has no entries yet')
+    return entries
+
+def read_log(path):
+    """
+    Returns the access log as one row per stage run: the city, selection, weights and total latency of the
+    rerun, and the stage, its outcome and its latency
+    Entries written before the log had a city are reruns of the default city
+    """
+    rows = []
+    for entry in read_entries(path):
+        for record in entry['stages']:
+            rows.append({'city': entry.get('city', default_city),
+                         'district': entry['district'],
+                         'main': entry['main'],
+                         'sub': entry['sub'],
+                         'weights': tuple(entry['weights']),
+                         'rerun_ms': entry['ms'],
+                         'stage': record['stage'],
+                         'outcome': record['outcome'],
+                         'ms': record['ms']})
+    return pd.DataFrame(rows, columns=['city', 'district', 'main', 'sub', 'weights', 'rerun_ms', 'stage', 'outcome',
+                                       'ms'])
+
+def report(path, top=10):
+    """
+    Summarizes the access log: popular selections and weights, latency percentiles and cache hit rates
+    per stage, slowest selections
+    The hit rate of a stage is the part of its shared cache lookups served without computing, reruns
+    that kept the result of the session (unchanged stage) are counted apart in its session rate
+    Returns a dictionary of dataframes
+    """
+    reruns = pd.DataFrame(read_entries(path))
+    reruns['weights'] = reruns['weights'].map(tuple)
+    reruns['city'] = reruns['city'].fillna(default_city) if 'city' in reruns else default_city
+    stages = read_log(path)
+
+    popular = reruns.groupby(['city', 'district', 'main', 'sub']).size().rename('reruns')\
+        .sort_values(ascending=False).head(top).reset_index()
+    popular_weights = reruns.groupby('weights').size().rename('reruns')\
+        .sort_values(ascending=False).head(top).reset_index()
+
+    latency = stages.groupby('stage')['ms'].describe(percentiles=[.5, .95, .99])\
+        [['count', '50%', '95%', '99%', 'max']]
+    computed_latency = stages[stages['outcome']=='computed'].groupby('stage')['ms']\
+        .quantile([.5, .95, .99]).unstack()\
+        .rename(columns={.5: 'computed 50%', .95: 'computed 95%', .99: 'computed 99%'})
+    outcomes = pd.crosstab(stages['stage'], stages['outcome'])\
+        .reindex(columns=['session', 'hit', 'coalesced', 'computed'], fill_value=0)
+    session_rate = (outcomes['session'] / outcomes.sum(axis=1)).rename('session_rate')
+    shared = outcomes['hit'] + outcomes['coalesced']
+    hit_rate = (shared / (shared + outcomes['computed'])).rename('hit_rate')
+    per_stage = latency.join(computed_latency).join(outcomes).join(session_rate).join(hit_rate)
+
+    slowest = reruns.groupby(['city', 'district', 'main', 'sub'])['ms'].quantile(.95).rename('rerun p95 ms')\
+        .sort_values(ascending=False).head(top).reset_index()
+    total = reruns['ms'].describe(percentiles=[.5, .95, .99])[['count', '50%', '95%', '99%', 'max']]
+
+    return {'reruns': total.to_frame('rerun ms'),
+            'popular selections': popular,
+            'popular weights': popular_weights,
+            'stages': per_stage,
+            'slowest selections': slowest}
+
+# Access log of this process
+access_log = AccessLog(path_access_log) if access_log_enabled else None
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarizes the access log of the app')
+    parser.add_argument('path', nargs='?', default=path_access_log)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    try:
+        tables = report(args.path, args.top)
+    except (OSError, ValueError) as error:
+        parser.exit(1, f'{error}\n')
+    with pd.option_context('display.width', 160, 'display.max_columns', 20):
+        for title, table in tables.items():
+            print(f'\n## {title}\n')
+            print(table.round(2).to_string())
+
+if __name__ == '__main__':
+    main()
@@ -1,441 +1,226 @@
 import streamlit as st
-st.set_page_config(layout="centered", page_title="Next Resturant in Geneva", page_icon=":cook:")
-import folium
-from streamlit_folium import folium_static
-from sklearn.preprocessing import MinMaxScaler
-import numpy as np
+st.set_page_config(layout="centered", page_title="Next Resturant", page_icon=":cook:")
 import os
+import sys
+import time
 import pandas as pd
-from scipy.spatial import ConvexHull
-
-
-# main dataframe with decreased columns
-data = pd.read_csv('data/data_combined_v1.05.csv')
-
-# Dataframe contains coordinates for district and district clusters
-df_cluster_centers = pd.read_csv('data/data_cluster_centers_v1.02.csv')
-df_district = pd.read_csv('data/data_district.csv')
-
-# Functions Start
-def filter_data(data, rest_district, rest_category_main, rest_category):
-    """
-    Filters main dataframe based on district or restaurant selection
-    FOR DROWDOWN MENUS
-    Returns a filtered dataframe
-    """
-    if rest_district != 'All':
-        data = data[data['district']==rest_district]
-
-    if rest_category_main != 'All':
-        data = data[data['combined_main_category_2']==rest_category_main]
-
-    if rest_category != 'All':
-        data = data[data['combined_main_category'].str.contains(rest_category)]
-
-    return data.reset_index(drop=True)
-
-def filter_data_scoring(data, rest_district, rest_category_main, rest_category):
-    """
-    Filters main dataframe based on district or restaurant selection
-    FOR SCORING
-    Returns a filtered dataframe
-    """
-    if rest_district != 'All':
-        data = data[data['district']==rest_district]
-
-    if rest_category_main != 'All':
-        data = data[data['combined_main_category_2']==rest_category_main]
-
-    if rest_category != 'All':
-        data = data[data['combined_main_category'].str.contains(rest_category)]
-
-    data = data.groupby(['district','district_cluster'])\
-        [['place_id', 'user_ratings_total','combined_rating']]\
-        .agg({'place_id':'count',
-        'user_ratings_total':'mean',
-        'combined_rating':'mean'})\
-        .rename(columns={'place_id':f'{rest_category.lower()}_restaurants'})
-
-    return data.reset_index()
-
-def merge_data(data, rest_district, rest_category_main, rest_category):
-    """
-    Creates a merged data set based on filtering selections and
-    returns the final data set before normalization and scoring
-    """
-    if rest_category == 'All':
-        data = filter_data_scoring(data, rest_district, rest_category_main, rest_category)
-    else:
-        data = filter_data_scoring(data, rest_district, 'All', 'All')\
-            .merge(
-                filter_data_scoring(data, rest_district, rest_category_main, rest_category)\
-                    .drop(columns=['district','user_ratings_total','combined_rating']),
-                how='left',
-                on='district_cluster')\
-            .fillna(0)
-    return data
-
-def score_data(data, rest_district, rest_category_main, rest_category, score_com, score_pop, score_sat):
-    """
-    Normalizes merged data set and create a custom scoring
-    """
-    # create merged data set
-    df_merged = merge_data(data, rest_district, rest_category_main, rest_category)
-
-    # normalization
-    scaler = MinMaxScaler()
-    cols = df_merged.drop(columns=['district','district_cluster'])
-    scaler.fit(cols)
-    df_score = pd.DataFrame(scaler.transform(cols), columns=cols.columns+'_norm')
-
-    # scoring
-    if rest_category == 'All':
-        score_tot = score_com + score_pop + score_sat
-        df_score['score'] = (score_com * (1-df_score['all_restaurants_norm'])\
-                            +score_pop * df_score['user_ratings_total_norm']\
-                            +score_sat * (1-df_score['combined_rating_norm']))\
-                            / score_tot
-
-
-    else:
-        score_tot = 2 * score_com + score_pop + score_sat
-        df_score['score'] = (score_com * (1-df_score['all_restaurants_norm'])\
-                            +score_pop * df_score['user_ratings_total_norm']\
-                            +score_sat * (1-df_score['combined_rating_norm'])
-                            +score_com * (1-df_score[f'{rest_category.lower()}_restaurants_norm']))\
-                            / score_tot
-
-    # create output data_set
-    df_output = pd.concat([df_merged, df_score], axis=1)\
-        .merge(df_cluster_centers, how='left', on='district_cluster')
-    return df_output
-
-def pick_location(data, rest_district, rest_category_main, rest_category, score_com, score_pop, score_sat):
-    """
-    Select best / worst location based on custom scoring
-    """
-    if rest_district == 'All':
-        n = 5
-    else:
-        n = 1
-
-    best_location = score_data(data, rest_district, rest_category_main, rest_category, score_com, score_pop, score_sat)\
-        .nlargest(n, 'score').reset_index(drop=True)
-    worst_location = score_data(data, rest_district, rest_category_main, rest_category, score_com, score_pop, score_sat)\
-        .nsmallest(n, 'score').reset_index(drop=True)
-
-    return best_location, worst_location
-
-def create_convexhull_polygon(map_object, list_of_points, layer_name, line_color, fill_color, weight, text):
-
-    # Since it is pointless to draw a convex hull polygon around less than 3 points check len of input
-    if len(list_of_points) > 2:
-
-        # Create the convex hull using scipy.spatial
-        form = [list_of_points[i] for i in ConvexHull(list_of_points).vertices]
-
-        # Create feature group, add the polygon and add the feature group to the map
-        fg = folium.FeatureGroup(name=layer_name)
-        fg.add_child(folium.vector_layers.Polygon(locations=form, color=line_color, fill_color=fill_color,
-                                                  weight=weight, stroke=False, popup=(text)))
-        map_object.add_child(fg)
-
-    return (map_object)
-# Functions END
-
-# Required dictionary for restaurant dropdown menu
-dict_rest = {
-    'All':['All'],
-    'European': ['All', 'French', 'Italian', 'Swiss', 'Portuguese', 'Spanish'],
-    'Asian':['All', 'Japanese', 'Chinese', 'Thai', 'Indian', 'Other Asian'],
-    'Middle Eastern & African': ['All', 'Lebanese', 'Turkish', 'Other Middle Eastern', 'African'],
-    'American': ['All', 'American', 'South American', 'Mexican', 'Hawaiian'],
-    'General': ['All', 'Restaurant', 'Bar / Pub / Bistro', 'Café'],
-    'Fast Food':['All', 'Pizza', 'Hamburger', 'Chicken', 'Snacks / Take Away'],
-    'Steakhouse / Barbecue / Grill': ['Steakhouse / Barbecue / Grill'],
-    'Seafood': ['Seafood'],
-    'Vegan / Vegetarian / Salad': ['Vegan / Vegetarian / Salad'],
-    'All Other': ['All Other']}
-
-# Required dictionary for area dropdown menu
-list_district = [
-    'All',
-    'Bâtie - Acacias',
-    'Champel',
-    'Saint-Jean Charmilles',
-    'Cité-Centre',
-    'Eaux-Vives - Lac',
-    'Grottes Saint-Gervais',
-    'Jonction - Plainpalais',
-    'La Cluse - Philosophes',
-    'Pâquis Sécheron',
-    'Servette Petit-Saconnex']
-
-# Required dictionary for sliders
-dict_slider1 = {'very low':0,
-               'low':1,
-               'neutral':2,
-               'high':3,
-               'very high':4}
-
-dict_slider2 = {'very low':4,
-               'low':3,
-               'neutral':2,
-               'high':1,
-               'very high':0}
-
-# Required dictionary for price levels
-dict_price = {4:'Expensive',
-              3:'Medium',
-              2:'Cheap'}
-
-# Dropdown Menu START
-st.sidebar.write('**Select Cuisine 🍽**')
-rest_category_main = st.sidebar.selectbox("Main Restaurant Category", dict_rest.keys())
-rest_category = st.sidebar.selectbox("Sub Restaurant Category", dict_rest[rest_category_main])
-rest_district = st.sidebar.selectbox('Select Area 🗺',list_district)
-
-st.sidebar.text("")
-st.sidebar.write('**Select Scoring Criteria 🎯**')
-#score_com = st.sidebar.slider('Number of Competitors', min_value=0, max_value=4, value=2, step=1)
-score_com_slider = st.sidebar.select_slider('Number of Competitors', options=['very low', 'low', 'neutral', 'high', 'very high'], value='neutral')
-st.sidebar.write('')
-score_pop_slider = st.sidebar.select_slider('Area Popularity', options=['very low', 'low', 'neutral', 'high', 'very high'], value='neutral')
-st.sidebar.write('')
-score_sat_slider = st.sidebar.select_slider('Customer Satisfaction', options=['very low', 'low', 'neutral', 'high', 'very high'], value='neutral')
-# Dropdown Menu END
-
-score_pop = dict_slider1[score_pop_slider]
-score_com = dict_slider2[score_com_slider]
-score_sat = dict_slider2[score_sat_slider]
-
-# filtered dataframe based on dropdpwn menu selection
-df = filter_data(data, rest_district, rest_category_main, rest_category)
-
-#create basic maps to be filled
-lat = df_district[df_district['district']==rest_district]['district_lat']
-lng = df_district[df_district['district']==rest_district]['district_lng']
-
-# dictionary for zoom levels
-zoom_start = {'All': 13.4,
-            'Bâtie - Acacias': 15.4,
-            'Champel': 14.4,
-            'Cité-Centre': 15.4,
-            'Eaux-Vives - Lac': 15,
-            'Grottes Saint-Gervais': 15.4,
-            'Jonction - Plainpalais': 15.4,
-            'La Cluse - Philosophes': 15.4,
-            'Pâquis Sécheron': 15.0,
-            'Saint-Jean Charmilles': 15.0,
-            'Servette Petit-Saconnex': 15.0}
-
-geneva_1 = folium.Map(location=[lat, lng], zoom_start=zoom_start[rest_district], tiles='cartodbpositron')
-geneva_2 = folium.Map(location=[lat, lng], zoom_start=zoom_start[rest_district], tiles=None)
-folium.TileLayer('cartodbpositron', name="Price Level").add_to(geneva_2)
-geneva_3 = folium.Map(location=[lat, lng], zoom_start=zoom_start[rest_district], tiles=None)
-folium.TileLayer('cartodbpositron', name="Review Score").add_to(geneva_3)
-geneva_4 = folium.Map(location=[lat, lng], zoom_start=zoom_start[rest_district], tiles=None)
-folium.TileLayer('cartodbpositron', name="# of Reviews").add_to(geneva_4)
-geneva_5 = folium.Map(location=[lat, lng], zoom_start=zoom_start[rest_district], tiles='cartodbpositron')
-
-
-st.header('Next Restaurant in Geneva 👨🏻‍🍳🇨🇭')
-
-# Map Section START
-## Map 01 - Overview
-marker_cluster = folium.plugins.MarkerCluster().add_to(geneva_1)
-
-if len(df)!=0:
-    for i,row in df.iterrows():
-        popup = folium.Popup(f"<b>{row['name']}</b><br>"
-                             f"Price Level: {dict_price.get(row['price_level_combined'],'-')}<br>"
-                             f"Review Score: {row['combined_rating']}<br>"
-                             f"# of Reviews: {row['user_ratings_total']}",
-                             max_width='120')
-        folium.Marker(
-            location=[row['geometry.location.lat'], row['geometry.location.lng']],
-            popup=popup).add_to(marker_cluster)
-
-## Map 02 - Price Levels
-group0 = folium.FeatureGroup(name="<span style='color:#FF0000'>Expensive</span>")
-group1 = folium.FeatureGroup(name="<span style='color:#FFA500'>Medium</span>")
-group2 = folium.FeatureGroup(name="<span style='color:#006400'>Cheap</span>")
-
-for i,row in df.iterrows():
-    popup = folium.Popup(f"<b>{row['name']}</b><br>"
-                            f"Price Level: {dict_price.get(row['price_level_combined'],'-')}<br>"
-                            f"Review Score: {row['combined_rating']}<br>"
-                            f"# of Reviews: {row['user_ratings_total']}",
-                            max_width='120')
-
-    if row['price_level_combined']<3:
-        folium.CircleMarker(location=[row['geometry.location.lat'], row['geometry.location.lng']],
-                            radius=4, color='green', fillColor='green', fill=False, opacity=0.5,
-                            popup=popup).add_to(group2)
-    elif row['price_level_combined']<4 and row['price_level_combined']>=3:
-        folium.CircleMarker(location=[row['geometry.location.lat'], row['geometry.location.lng']],
-                            radius=4, color='orange', fillColor='orange', fill=False, opacity=0.5,
-                            popup=popup).add_to(group1)
-    elif row['price_level_combined']>=4:
-        folium.CircleMarker(location=[row['geometry.location.lat'], row['geometry.location.lng']],
-                            radius=4, color='red', fillColor='red', fill=False, opacity=0.5,
-                            popup=popup).add_to(group0)
-
-group0.add_to(geneva_2)
-group1.add_to(geneva_2)
-group2.add_to(geneva_2)
-folium.map.LayerControl('topright', collapsed=False).add_to(geneva_2)
-
-## Map 03 - Review Scores
-group0 = folium.FeatureGroup(name="<span style='color:#FF0000'>Low</span>")
-group1 = folium.FeatureGroup(name="<span style='color:#FFA500'>Average</span>")
-group2 = folium.FeatureGroup(name="<span style='color:#006400'>High</span>")
-
-for i,row in df.iterrows():
-    popup = folium.Popup(f"<b>{row['name']}</b><br>"
-                            f"Price Level: {dict_price.get(row['price_level_combined'],'-')}<br>"
-                            f"Review Score: {row['combined_rating']}<br>"
-                            f"# of Reviews: {row['user_ratings_total']}",
-                            max_width='120')
-
-    if row['combined_rating']<4.0:
-        folium.CircleMarker(location=[row['geometry.location.lat'], row['geometry.location.lng']],
-                            radius=4, color='red',fillColor='red', fill=False, opacity=0.5,
-                            popup=popup).add_to(group0)
-    elif row['combined_rating']>4.0 and row['combined_rating']<4.5:
-        folium.CircleMarker(location=[row['geometry.location.lat'], row['geometry.location.lng']],
-                            radius=4, color='orange',fillColor='orange', fill=False, opacity=0.5,
-                            popup=popup).add_to(group1)
-    elif row['combined_rating']>4.5:
-        folium.CircleMarker(location=[row['geometry.location.lat'], row['geometry.location.lng']],
-                            radius=4, color='green',fillColor='green', fill=False, opacity=0.5,
-                            popup=popup).add_to(group2)
-
-group0.add_to(geneva_3)
-group1.add_to(geneva_3)
-group2.add_to(geneva_3)
-
-folium.map.LayerControl('topright', collapsed=False).add_to(geneva_3)
-
-## Map 04 - Number of Reviews
-group0 = folium.FeatureGroup(name="<span style='color:#FF0000'>Low</span>")
-group1 = folium.FeatureGroup(name="<span style='color:#FFA500'>Average</span>")
-group2 = folium.FeatureGroup(name="<span style='color:#90EE90'>High</span>")
-group3 = folium.FeatureGroup(name="<span style='color:#006400'>Very High</span>")
-
-for i,row in df.iterrows():
-    popup = folium.Popup(f"<b>{row['name']}</b><br>"
-                        f"Price Level: {dict_price.get(row['price_level_combined'],'-')}<br>"
-                        f"Review Score: {row['combined_rating']}<br>"
-                        f"# of Reviews: {row['user_ratings_total']}",
-                        max_width='120')
-    if row['user_ratings_total']<50.0:
-        folium.CircleMarker(location=[row['geometry.location.lat'], row['geometry.location.lng']],
-                            radius=4, color='red',fillColor='red', fill=True, opacity=0.5,
-                            popup=popup).add_to(group0)
-    elif row['user_ratings_total']>=50.0 and row['user_ratings_total']<150.0:
-        folium.CircleMarker(location=[row['geometry.location.lat'], row['geometry.location.lng']],
-                            radius=4, color='orange',fillColor='orange', fill=True, opacity=0.5,
-                            popup=popup).add_to(group1)
-    elif row['user_ratings_total']>=150.0 and row['user_ratings_total']<250.0:
-        folium.CircleMarker(location=[row['geometry.location.lat'], row['geometry.location.lng']],
-                            radius=4, color='lightgreen',fillColor='lightgreen', fill=True, opacity=0.5,
-                            popup=popup).add_to(group2)
-    elif row['user_ratings_total']>=250.0:
-        folium.CircleMarker(location=[row['geometry.location.lat'], row['geometry.location.lng']],
-                            radius=4, color='green',fillColor='green', fill=True, opacity=0.5,
-                            popup=popup).add_to(group3)
-group0.add_to(geneva_4)
-group1.add_to(geneva_4)
-group2.add_to(geneva_4)
-group3.add_to(geneva_4)
-
-folium.map.LayerControl('topright', collapsed=False).add_to(geneva_4)
-
-## Map 05 - Best / Worst Location
-best_locations = pick_location(data, rest_district, rest_category_main, rest_category, score_com, score_pop, score_sat)[0]
-worst_locations = pick_location(data, rest_district, rest_category_main, rest_category, score_com, score_pop, score_sat)[1]
-
-for i, row in best_locations.iterrows():
-    str_comp = f"{row['all_restaurants']}"
-    if rest_category != 'All':
-        col = f'{rest_category.lower()}_restaurants'
-        str_comp += f" ({int(row[col])} Direct)"
-
-    popup = folium.Popup(f"<b>#{i+1} Best Location</b><br>"
-                        f"District: {row['district']}<br>"
-                        f"Competitors: {str_comp}<br>"
-                        f"Avg. Review Score: {round(row['combined_rating'],1)}<br>"
-                        f"Avg. # of Reviews: {int(row['user_ratings_total'])}",
-                        max_width='200')
-    cluster = row['district_cluster']
-    list_of_points = data[data['district_cluster']==cluster][['geometry.location.lat','geometry.location.lng']].to_numpy()
-    create_convexhull_polygon(geneva_5, list_of_points, layer_name='Best Locations',
-                        line_color='green',
-                        fill_color='green',
-                        weight=1,
-                        text=popup)
-
-for i, row in worst_locations.iterrows():
-    str_comp = f"{row['all_restaurants']}"
-    if rest_category != 'All':
-        col = f'{rest_category.lower()}_restaurants'
-        str_comp += f" ({int(row[col])} Direct)"
-
-    popup = folium.Popup(f"<b>#{i+1} Worst Location</b><br>"
-                        f"District: {row['district']}<br>"
-                        f"Competitors: {str_comp}<br>"
-                        f"Avg. Review Score: {round(row['combined_rating'],1)}<br>"
-                        f"Avg. # of Reviews: {int(row['user_ratings_total'])}",
-                        max_width='200')
-
-    cluster = row['district_cluster']
-    list_of_points = data[data['district_cluster']==cluster][['geometry.location.lat','geometry.location.lng']].to_numpy()
-    create_convexhull_polygon(geneva_5, list_of_points, layer_name='Worst Locations',
-                        line_color='red',
-                        fill_color='red',
-                        weight=1,
-                        text=popup)
-
-if rest_category_main=='All' and rest_category=='All' and rest_district=='All':
-    res = 'all restaurants in Geneva'
-elif rest_category_main!='All' and rest_category=='All' and rest_district=='All':
-    res = f'all {rest_category_main} restaurants in Geneva'
-elif rest_category_main!='All' and rest_category!='All' and rest_district=='All':
-    res = f'all {rest_category} restaurants in Geneva'
-elif rest_category_main!='All' and rest_category!='All' and rest_district!='All':
-    res = f'all {rest_category} restaurants in {rest_district}'
-elif rest_category_main=='All' and rest_category=='All' and rest_district!='All':
-    res = f'all restaurants in {rest_district}'
-elif rest_category_main!='All' and rest_category=='All' and rest_district!='All':
-    res = f'all {rest_category_main} restaurants in {rest_district}'
-
-## Map Display
-tab1, tab2, tab3, tab4, tab5 = st.tabs(["🗺 Overview", "＄ Price Levels", "📊 Review Scores", "📈 Number of Reviews", "🟢🔴 Best/Worst Locations"])
-
-with tab1:
-    folium_static(geneva_1)
-    st.write(f'The overview illustrates {res} 📍')
-    st.write('Please use the dropdown menus on the left to make a selection')
-
-with tab2:
-    folium_static(geneva_2)
-    st.write(f'The map illustrates the **Price Level** of {res} 📍')
-    st.write(f'Please use the checkboxes ☑️ to filter your selection')
-
-with tab3:
-    folium_static(geneva_3)
-    st.write(f'The map illustrates the **Review Score** of {res} 📍')
-    st.write(f'Please use the checkboxes ☑️ to filter your selection')
-
-with tab4:
-    folium_static(geneva_4)
-    st.write(f'The map illustrates the **Number of Reviews** of {res} 📍')
-    st.write(f'Please use the checkboxes ☑️ to filter your selection')
-
-with tab5:
-    folium_static(geneva_5)
-    st.write("The map illustrates the **Best Locations** in 🟢 green and the **Worst Locations** in 🔴 red")
-    st.write('Select the Criteria on the left to change the scoring')
-
-# Map Section END
+rerun_start = time.perf_counter()
+
+# streamlit only puts the script folder on the path, the package lives one level up
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from best_restaurant_location.params import dict_slider1, dict_slider2, list_tabs, map_renderer, \
+    dict_bins, default_city, warmup_enabled, debug_enabled, profiling_enabled, path_profiles, \
+    profiles_kept
+from best_restaurant_location.stages import dict_cities, live, load_stage, filter_stage, map_view, map_key, \
+    restaurant_map_stage, location_map_stage
+from best_restaurant_location.cache import shared_cache
+from best_restaurant_location.pipeline import Pipeline
+from best_restaurant_location.singleflight import flights
+from best_restaurant_location import warmup
+from best_restaurant_location import watcher
+from best_restaurant_location.access_log import access_log
+from best_restaurant_location import timing
+from best_restaurant_location import profiling
+from best_restaurant_location import memory
+
+timing.setup_logging()
+debug = debug_enabled or st.query_params.get('debug') == '1'
+if debug:
+    timing.start()
+
+# ?profile=1 runs this rerun under cProfile, one rerun of the process at a time
+profile = profiling_enabled and st.query_params.get('profile') == '1'
+profiler = profiling.start() if profile else None
+
+try:
+    # Every stage of the app (load, filter, scoring and each map) only reruns when its inputs change,
+    # so moving a scoring slider only recomputes the scoring and the best / worst location map.
+    # Results are also shared between sessions, so a selection is only computed once per process,
+    # even when several sessions ask for it at the same moment.
+    pipeline = Pipeline(st.session_state.setdefault('pipeline', {}), shared_cache, flights, live)
+
+    # The first run of the process starts filling the shared cache with the popular selections in the background
+    if warmup_enabled:
+        warmup.start_warmup()
+    # and the watcher that swaps in the new versions of the data
+    watcher.start_watcher()
+
+    # Dropdown Menu START
+    # the selector only shows up once there is more than one city
+    city = st.sidebar.selectbox('Select City 🏙', list(dict_cities)) if len(dict_cities) > 1 else default_city
+
+    # the data of a city is only loaded when a session first selects it
+    dataset = load_stage(pipeline, city)
+    data, df_cluster_centers, df_district = dataset.data, dataset.cluster_centers, dataset.districts
+
+    # only the selections with restaurants in the data of the city are offered, districts with none are left out
+    menu = dataset.config['menu']
+    st.sidebar.write('**Select Cuisine 🍽**')
+    rest_category_main = st.sidebar.selectbox("Main Restaurant Category", list(menu))
+    rest_category = st.sidebar.selectbox("Sub Restaurant Category", list(menu[rest_category_main]))
+    rest_district = st.sidebar.selectbox('Select Area 🗺', list(menu[rest_category_main][rest_category]))
+
+    st.sidebar.text("")
+    st.sidebar.write('**Select Scoring Criteria 🎯**')
+    #score_com = st.sidebar.slider('Number of Competitors', min_value=0, max_value=4, value=2, step=1)
+    score_com_slider = st.sidebar.select_slider('Number of Competitors', options=['very low', 'low', 'neutral', 'high', 'very high'], value='neutral')
+    st.sidebar.write('')
+    score_pop_slider = st.sidebar.select_slider('Area Popularity', options=['very low', 'low', 'neutral', 'high', 'very high'], value='neutral')
+    st.sidebar.write('')
+    score_sat_slider = st.sidebar.select_slider('Customer Satisfaction', options=['very low', 'low', 'neutral', 'high', 'very high'], value='neutral')
+    # Dropdown Menu END
+
+    score_pop = dict_slider1[score_pop_slider]
+    score_com = dict_slider2[score_com_slider]
+    score_sat = dict_slider2[score_sat_slider]
+
+    selection = (rest_district, rest_category_main, rest_category)
+    weights = (score_com, score_pop, score_sat)
+
+    # filtered dataframe based on dropdpwn menu selection
+    df = filter_stage(pipeline, dataset, selection)
+
+    # center and zoom of the maps to be filled
+    location, zoom = map_view(df_district, rest_district)
+
+    st.header(f'Next Restaurant in {city} 👨🏻‍🍳🇨🇭')
+
+    # Map Section START
+    # Maps are only built for the visible tab. The rendered html is kept in the shared cache,
+    # so switching tabs or coming back to a popular selection skips folium.
+    def show_map(html):
+        # the map html is built by the app from the data, never from user input
+        st.iframe(html, height=510, width=700)
+
+    def show_restaurant_map(name, spec=None):
+        """
+        Shows one of the restaurant maps 01-04 with the renderer of the deployment
+        """
+        if map_renderer == 'pydeck':
+            from best_restaurant_location.decks import build_deck
+            deck = pipeline.stage(f'deck_{name}', (dataset.key, selection),
+                                  lambda: build_deck(df, location, zoom, spec), shared=False)
+            st.pydeck_chart(deck, height=500)
+            if spec is not None:
+                st.markdown(' '.join(f"<span style='color:{legend_color}'>●</span> {label}"
+                                     for label, legend_color, color in spec['bins']), unsafe_allow_html=True)
+        else:
+            show_map(restaurant_map_stage(pipeline, dataset, name, df, selection, location, zoom))
+
+    if rest_category_main=='All' and rest_category=='All' and rest_district=='All':
+        res = f'all restaurants in {city}'
+    elif rest_category_main!='All' and rest_category=='All' and rest_district=='All':
+        res = f'all {rest_category_main} restaurants in {city}'
+    elif rest_category_main!='All' and rest_category!='All' and rest_district=='All':
+        res = f'all {rest_category} restaurants in {city}'
+    elif rest_category_main!='All' and rest_category!='All' and rest_district!='All':
+        res = f'all {rest_category} restaurants in {rest_district}'
+    elif rest_category_main=='All' and rest_category=='All' and rest_district!='All':
+        res = f'all restaurants in {rest_district}'
+    elif rest_category_main!='All' and rest_category=='All' and rest_district!='All':
+        res = f'all {rest_category_main} restaurants in {rest_district}'
+
+    ## Map Display
+    # on_change='rerun' makes the tabs track which one is open, so hidden tabs are skipped
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(list_tabs, key='map_tab', on_change='rerun')
+
+    if tab1.open:
+        with tab1:
+            show_restaurant_map('overview')
+            st.write(f'The overview illustrates {res} 📍')
+            st.write('Please use the dropdown menus on the left to make a selection')
+
+    if tab2.open:
+        with tab2:
+            show_restaurant_map('price', dict_bins['price'])
+            st.write(f'The map illustrates the **Price Level** of {res} 📍')
+            st.write(f'Please use the checkboxes ☑️ to filter your selection')
+
+    if tab3.open:
+        with tab3:
+            show_restaurant_map('rating', dict_bins['rating'])
+            st.write(f'The map illustrates the **Review Score** of {res} 📍')
+            st.write(f'Please use the checkboxes ☑️ to filter your selection')
+
+    if tab4.open:
+        with tab4:
+            show_restaurant_map('reviews', dict_bins['reviews'])
+            st.write(f'The map illustrates the **Number of Reviews** of {res} 📍')
+            st.write(f'Please use the checkboxes ☑️ to filter your selection')
+
+    if tab5.open:
+        with tab5:
+            show_map(location_map_stage(pipeline, dataset, selection, weights, location, zoom))
+            st.write("The map illustrates the **Best Locations** in 🟢 green and the **Worst Locations** in 🔴 red")
+            st.write('Select the Criteria on the left to change the scoring')
+
+    # Map Section END
+
+    timings = timing.stop()
+    if profiler is not None:
+        profile_path = profiling.stop(profiler, path_profiles, '_'.join(selection), profiles_kept)
+finally:
+    # a rerun stopped halfway, e.g. by the next rerun of its session, also leaves the profiler to the others
+    profiling.release(profiler)
+
+rerun_ms = round((time.perf_counter() - rerun_start) * 1000, 2)
+
+# Access log of the rerun, written in the background
+if access_log is not None:
+    access_log.write({'time': time.time(),
+                      'city': city,
+                      'district': rest_district,
+                      'main': rest_category_main,
+                      'sub': rest_category,
+                      'weights': list(weights),
+                      'tab': st.session_state.get('map_tab'),
+                      'ms': rerun_ms,
+                      'stages': [{'stage': record['stage'],
+                                  'outcome': record['outcome'],
+                                  'ms': round(record['seconds'] * 1000, 2)} for record in pipeline.log]})
+
+# Debug Section START
+if profile:
+    with st.expander('Profile', expanded=True):
+        if profiler is None:
+            st.write('Profiler busy: another rerun of this process is being profiled, try again in a moment')
+        else:
+            st.write(f'Profile of this rerun saved to `{profile_path}`, '
+                     f'open it with `python -m pstats` or snakeviz. Top functions by cumulative time:')
+            st.dataframe(profiling.top_functions(profile_path))
+
+if debug:
+    timing.log_timings(timings, selection=selection, weights=weights)
+
+    with st.expander('Debug'):
+        st.write(f'Rerun: {rerun_ms} ms')
+        st.write('Timings (rows processed and payload bytes where they apply)')
+        st.table(pd.DataFrame([{'stage': ' ' * record['depth'] + record['stage'],
+                                'ms': record['ms'],
+                                'rows': record['rows'],
+                                'bytes': record['bytes'],
+                                'outcome': record.get('outcome')} for record in timings.records]))
+        map_keys = {'Overview': ('map_overview', map_key(dataset, selection)),
+                    'Price Levels': ('map_price', map_key(dataset, selection)),
+                    'Review Scores': ('map_rating', map_key(dataset, selection)),
+                    'Number of Reviews': ('map_reviews', map_key(dataset, selection)),
+                    'Best/Worst Locations': ('map_location', map_key(dataset, selection, weights))}
+        st.write('Map html size (only maps already built for this selection)')
+        st.table(pd.DataFrame({'bytes': [shared_cache.entry_size(key) for key in map_keys.values()]},
+                              index=list(map_keys.keys())))
+        st.write('Shared result cache')
+        st.json(shared_cache.stats())
+        # the sqlite backend leaves the restaurants in its database
+        if data is not None:
+            st.write('Memory of the restaurants by column')
+            st.dataframe(memory.frame_memory(data))
+        st.write('Memory of the shared cache entries')
+        st.dataframe(memory.cache_memory(shared_cache))
+        st.write('Stages that waited on another session computing the same result')
+        st.write(pipeline.coalesced)
+        st.json(flights.stats())
+        st.write('Cache warm-up')
+        st.json(dict(warmup.status))
+        st.write('Data reloads')
+        st.json(dict(watcher.status))
+# Debug Section END
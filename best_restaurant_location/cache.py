@@ -0,0 +1,174 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def sizeof(value):
+    """
+    Returns the size in bytes accounted for a cached value
+    Frames are measured deep, so object columns count the strings they hold, and other objects
+    (e.g. a Dataset) by their attributes
+    """
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, (pd.Index, pd.Categorical)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(sizeof(item) for item in value)
+    if isinstance(value, dict):
+        return sum(sizeof(key) + sizeof(item) for key, item in value.items())
+    if hasattr(value, '__dict__'):
+        return sizeof(vars(value))
+    return sys.getsizeof(value)
+
+class LRUCache:
+    """
+    Least recently used cache bounded by the total byte size of its values
+    Safe to share between the threads serving the streamlit sessions
+    Cached values are shared, callers must not modify them
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.sizes = {}
+        # monotonic time of the last get, put or touch of every entry
+        self.used = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.idle_evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns the cached value or None, and marks it as most recently used
+        """
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            self.used[key] = time.monotonic()
+            return self.entries[key]
+
+    def peek(self, key):
+        """
+        Returns the cached value or None, without counting a lookup
+        """
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            self.used[key] = time.monotonic()
+            return self.entries[key]
+
+    def put(self, key, value):
+        """
+        Stores a value and evicts least recently used entries until the cache fits its budget
+        Values larger than the whole budget are not cached
+        """
+        size = sizeof(value)
+        with self.lock:
+            if key in self.entries:
+                self.remove(key)
+            if size > self.max_bytes:
+                return value
+            self.entries[key] = value
+            self.sizes[key] = size
+            self.used[key] = time.monotonic()
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self.remove(next(iter(self.entries)))
+                self.evictions += 1
+        return value
+
+    def remove(self, key):
+        # callers hold the lock
+        del self.entries[key]
+        del self.used[key]
+        self.bytes -= self.sizes.pop(key)
+
+    def touch(self, key):
+        """
+        Marks an entry as used now, without counting a lookup nor changing the eviction order
+        """
+        with self.lock:
+            if key in self.used:
+                self.used[key] = time.monotonic()
+
+    def evict_idle(self, stage, seconds):
+        """
+        Evicts the entries of a stage not used for seconds, returns their keys
+        """
+        with self.lock:
+            limit = time.monotonic() - seconds
+            keys = [key for key, used in self.used.items()
+                    if isinstance(key, tuple) and key[0] == stage and used < limit]
+            for key in keys:
+                self.remove(key)
+            self.idle_evictions += len(keys)
+        return keys
+
+    def drop(self, predicate):
+        """
+        Removes the entries whose key matches predicate, returns their number
+        """
+        with self.lock:
+            keys = [key for key in self.entries if predicate(key)]
+            for key in keys:
+                self.remove(key)
+        return len(keys)
+
+    def entry_size(self, key):
+        """
+        Returns the accounted size of an entry, or None if it is not cached
+        Does not count as a lookup nor change the eviction order
+        """
+        with self.lock:
+            return self.sizes.get(key)
+
+    def entry_sizes(self):
+        """
+        Returns the (key, size) of every entry, least recently used first
+        """
+        with self.lock:
+            return list(self.sizes.items())
+
+    def stats(self):
+        """
+        Returns the counters of the cache
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            bytes_per_stage = {}
+            for key, size in self.sizes.items():
+                stage = key[0] if isinstance(key, tuple) else key
+                bytes_per_stage[stage] = bytes_per_stage.get(stage, 0) + size
+            return {'entries': len(self.entries),
+                    'bytes': self.bytes,
+                    'max_bytes': self.max_bytes,
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else 0.0,
+                    'evictions': self.evictions,
+                    'idle_evictions': self.idle_evictions,
+                    'bytes_per_stage': bytes_per_stage}
+
+# Results shared by all sessions of the process (loaded data, filtered frames, scores and map html)
+# keyed by stage name and stage key, within one global budget
+shared_cache = LRUCache(max_bytes=int(os.environ.get('BRL_CACHE_MB', 256)) * 1024 * 1024)
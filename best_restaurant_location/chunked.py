@@ -0,0 +1,234 @@
+"""
+Out-of-core compilation of a bundle: the restaurants are read in chunks of the columns the app reads,
+and the frame, indexes, cube, hulls, zoom table and config of the bundle are built chunk by chunk, so the memory
+used is bounded by the chunk size and not by the size of the data file
+"""
+import json
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from best_restaurant_location.dataset import aggregate_cube, category_columns, combine_extents, config_of, \
+    cube_keys, district_extents, district_zoom, index_columns, load_bundle, write_frame, write_manifest, write_shapes
+from best_restaurant_location.maps import convex_hull, restaurant_popup_html
+from best_restaurant_location.scoring import data_columns
+from best_restaurant_location.timing import span
+
+logger = logging.getLogger(__name__)
+
+# Rows of a column converted or indexed at once when the chunks are put together
+block_rows = 1 << 20
+
+
+def convert_raw(raw, path, dtype, transform=None):
+    """
+    Converts the raw values of a column appended to the file raw into the .npy file path, block by block
+    transform maps every block of values before it is written
+    """
+    n = os.path.getsize(raw) // np.dtype(dtype).itemsize
+    values = np.memmap(raw, dtype=dtype, mode='r') if n else np.zeros(0, dtype=dtype)
+    out_dtype = dtype if transform is None else transform(values[:0]).dtype
+    out = np.lib.format.open_memmap(path, mode='w+', dtype=out_dtype, shape=(n,))
+    for start in range(0, n, block_rows):
+        block = values[start:start + block_rows]
+        out[start:start + len(block)] = block if transform is None else transform(block)
+    out.flush()
+    del out, values
+    os.remove(raw)
+
+
+class FrameWriter:
+    """
+    Writes a frame chunk by chunk in the layout of dataset.write_frame
+    The values of every column are appended to a raw file and converted by close(). Category codes
+    are numbered in order of appearance while appending, and renumbered in the order of the sorted
+    categories by close(), the codes astype('category') gives
+    """
+    def __init__(self, directory, category_columns):
+        os.makedirs(directory)
+        self.directory = directory
+        self.category_columns = category_columns
+        self.kinds = None
+        self.files = {}
+        self.dtypes = {}
+        self.text_bytes = {}
+        self.offsets = {}
+        self.categories = {column: {} for column in category_columns}
+        self.rows = 0
+
+    def open(self, df):
+        """
+        Opens the files of the columns of the first chunk, text columns start with their offset 0
+        """
+        self.kinds = {}
+        for column in df.columns:
+            path = os.path.join(self.directory, column)
+            self.files[column] = open(f'{path}.raw', 'wb')
+            if column in self.category_columns:
+                self.kinds[column] = 'category'
+            elif pd.api.types.is_numeric_dtype(df[column].dtype):
+                self.kinds[column] = 'numeric'
+                self.dtypes[column] = df[column].dtype
+            else:
+                self.kinds[column] = 'text'
+                self.text_bytes[column] = open(f'{path}.utf8', 'wb')
+                self.offsets[column] = 0
+                self.files[column].write(np.zeros(1, dtype=np.int64).tobytes())
+
+    def append(self, df):
+        if self.kinds is None:
+            self.open(df)
+        for column, kind in self.kinds.items():
+            series = df[column]
+            if kind == 'category':
+                seen = self.categories[column]
+                codes, uniques = pd.factorize(series)
+                mapping = np.array([seen.setdefault(value, len(seen)) for value in uniques] + [-1], dtype=np.int64)
+                # code -1 of a missing value picks the -1 at the end of mapping
+                values = mapping[codes]
+            elif kind == 'numeric':
+                values = series.to_numpy(dtype=self.dtypes[column])
+            else:
+                if series.isna().any():
+                    raise ValueError(f'column {column} holds missing values, it cannot be written as text')
+                encoded = series.str.encode('utf-8')
+                values = self.offsets[column] + encoded.str.len().to_numpy(dtype=np.int64).cumsum()
+                if len(values):
+                    self.offsets[column] = int(values[-1])
+                self.text_bytes[column].write(b''.join(encoded))
+            self.files[column].write(values.tobytes())
+        self.rows += len(df)
+
+    def close(self):
+        """
+        Converts the raw files to the files of write_frame
+        Returns the column specs of the manifest and the sorted categories of the category columns
+        """
+        columns, categories = {}, {}
+        for column, kind in self.kinds.items():
+            self.files[column].close()
+            path = os.path.join(self.directory, column)
+            if kind == 'category':
+                seen = self.categories[column]
+                categories[column] = pd.Index(sorted(seen))
+                # code of appearance -> code in the sorted categories, the last entry keeps -1
+                rank = np.full(len(seen) + 1, -1)
+                rank[[seen[value] for value in categories[column]]] = np.arange(len(seen))
+                dtype = pd.Categorical.from_codes([], categories=categories[column]).codes.dtype
+                convert_raw(f'{path}.raw', f'{path}.npy', np.int64, lambda codes: rank[codes].astype(dtype))
+                with open(f'{path}.json', 'w', encoding='utf-8') as f:
+                    json.dump(categories[column].tolist(), f, ensure_ascii=False)
+            elif kind == 'numeric':
+                convert_raw(f'{path}.raw', f'{path}.npy', self.dtypes[column])
+            else:
+                self.text_bytes[column].close()
+                convert_raw(f'{path}.raw', f'{path}.offsets.npy', np.int64)
+            columns[column] = kind
+        return columns, categories
+
+def write_index(codes, n_categories, path):
+    """
+    Writes the postings of the memory-mapped category codes to path.order.npy and path.offsets.npy,
+    the same as dataset.build_index, counting sorted block by block
+    """
+    counts = np.zeros(n_categories, dtype=np.int64)
+    for start in range(0, len(codes), block_rows):
+        block = codes[start:start + block_rows]
+        counts += np.bincount(block[block >= 0], minlength=n_categories)
+    offsets = np.concatenate([[0], counts.cumsum()])
+    np.save(f'{path}.offsets.npy', offsets)
+
+    order = np.lib.format.open_memmap(f'{path}.order.npy', mode='w+', dtype=np.int64, shape=(int(offsets[-1]),))
+    # next free position of every category in order
+    cursor = offsets[:-1].copy()
+    for start in range(0, len(codes), block_rows):
+        block = codes[start:start + block_rows]
+        rows = np.argsort(block, kind='stable')
+        rows = rows[block[rows] >= 0]
+        sorted_codes = block[rows]
+        block_counts = np.bincount(sorted_codes, minlength=n_categories)
+        # position of every row among the rows of its category in the block
+        rank = np.arange(len(rows)) - np.concatenate([[0], block_counts.cumsum()])[sorted_codes]
+        order[cursor[sorted_codes] + rank] = start + rows
+        cursor += block_counts
+    order.flush()
+
+def add_hull_points(hull_points, chunk):
+    """
+    Merges the points of chunk into the hull vertices kept by district cluster, the hull of a
+    cluster is the hull of the vertices of its earlier chunks and of its new points
+    A cluster without a hull yet (less than 3 points, or all of them equal or on one line) keeps its points
+    """
+    for cluster, points in chunk.groupby('district_cluster')[['geometry.location.lat', 'geometry.location.lng']]:
+        points = points.to_numpy()
+        if cluster in hull_points:
+            points = np.concatenate([hull_points[cluster], points])
+        form = convex_hull(points)
+        hull_points[cluster] = points if form is None else np.array(form)
+
+def write_bundle_chunked(paths, directory, version, chunksize):
+    """
+    Writes the bundle of the csv files at paths under directory reading chunksize restaurants at a time,
+    the same bundle as dataset.write_bundle of the whole files
+    Returns the number of restaurants and the rows per second of the compilation
+    """
+    path_data, path_cluster_centers, path_district = paths
+    start = time.perf_counter()
+    writer = FrameWriter(os.path.join(directory, 'data'), category_columns)
+    cube, extents, hull_points = None, None, {}
+
+    for chunk in pd.read_csv(path_data, usecols=list(data_columns), dtype=data_columns, chunksize=chunksize):
+        with span('compile_chunk', rows=len(chunk)):
+            chunk = chunk[list(data_columns)]
+            chunk['popup_html'] = restaurant_popup_html(chunk)
+            writer.append(chunk)
+
+            # the partial cubes add up, they are summed as the chunks come
+            cube = aggregate_cube(chunk) if cube is None else \
+                pd.concat([cube, aggregate_cube(chunk)]).groupby(cube_keys, dropna=False).sum().reset_index()
+            extents = district_extents(chunk) if extents is None else \
+                combine_extents([extents, district_extents(chunk)])
+            add_hull_points(hull_points, chunk)
+        logger.info('%s: %d restaurants read, %.0f rows/s', path_data, writer.rows,
+                    writer.rows / (time.perf_counter() - start))
+    if writer.kinds is None:
+        raise ValueError(f'{path_data} holds no restaurants')
+
+    frames = {}
+    frames['data'], categories = writer.close()
+
+    os.makedirs(os.path.join(directory, 'indexes'))
+    for column in index_columns:
+        codes = np.load(os.path.join(directory, 'data', f'{column}.npy'), mmap_mode='r')
+        write_index(codes, len(categories[column]), os.path.join(directory, 'indexes', column))
+
+    # keys of the cube as categories of the restaurants, in the order of build()
+    for column in cube_keys:
+        if column in categories:
+            cube[column] = pd.Categorical(cube[column], categories=categories[column])
+    cube = cube.groupby(cube_keys, observed=True, dropna=False).sum().reset_index()
+
+    frames['cluster_centers'] = write_frame(os.path.join(directory, 'cluster_centers'),
+                                            pd.read_csv(path_cluster_centers))
+    districts = district_zoom(pd.read_csv(path_district), extents)
+    frames['districts'] = write_frame(os.path.join(directory, 'districts'), districts)
+    frames['cube'] = write_frame(os.path.join(directory, 'cube'), cube)
+
+    # the kept points of a cluster without a hull are left out, as build() leaves it out
+    hulls = {}
+    for cluster, points in sorted(hull_points.items()):
+        form = convex_hull(points)
+        if form is not None:
+            hulls[int(cluster)] = [[float(lat), float(lng)] for lat, lng in form]
+    write_shapes(directory, hulls, config_of(categories, cube, districts))
+    write_manifest(directory, version, paths, writer.rows, frames)
+
+    # the database is filled from the frames just written, memory-mapped, a chunk at a time
+    from best_restaurant_location.sqlstore import sqlite_name, write_sqlite
+    write_sqlite(load_bundle(directory), os.path.join(directory, sqlite_name), block=chunksize)
+
+    seconds = time.perf_counter() - start
+    return {'rows': writer.rows, 'seconds': round(seconds, 2), 'rows_per_second': round(writer.rows / seconds)}
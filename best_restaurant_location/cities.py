@@ -0,0 +1,86 @@
+"""
+The cities of the app: each city is a partition of the data with its own restaurants, cluster centers
+and districts (with the zoom table of its maps), compiled into its own bundles directory
+The data files of a city are named by the manifest of its directory, publishing a new version of the data
+copies its files next to the others and replaces the manifest, which the running app picks up
+Usage: python -m best_restaurant_location.cities data --version v1.06 --data data_combined_v1.06.csv
+"""
+import argparse
+import json
+import os
+
+from best_restaurant_location.params import default_city, path_data, path_cluster_centers, path_district, \
+    path_cities, path_bundles
+
+# Manifest of the data files of a city directory: {"version": ..., "data": ..., "cluster_centers": ...,
+# "district": ...} with the file names relative to the directory
+manifest_name = 'manifest.json'
+manifest_files = ['data', 'cluster_centers', 'district']
+
+
+def read_manifest(directory):
+    """
+    Returns the manifest of a city directory, or the file names of params when it has none
+    """
+    try:
+        with open(os.path.join(directory, manifest_name), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'version': None,
+                **{name: os.path.basename(path)
+                   for name, path in zip(manifest_files, (path_data, path_cluster_centers, path_district))}}
+
+def manifest_paths(directory):
+    """
+    Returns the paths of the data files of the manifest of a city directory
+    """
+    manifest = read_manifest(directory)
+    return [os.path.join(directory, manifest[name]) for name in manifest_files]
+
+def publish(directory, version, **files):
+    """
+    Points the manifest of a city directory to version and to the given files, the others are kept
+    The manifest is replaced at once, so the app never reads half of it
+    """
+    manifest = read_manifest(directory)
+    manifest.update(files, version=version)
+    for name in manifest_files:
+        if not os.path.isfile(os.path.join(directory, manifest[name])):
+            raise FileNotFoundError(f'{manifest[name]} is not in {directory}')
+    path = os.path.join(directory, manifest_name)
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(f'{path}.tmp', path)
+    return manifest
+
+def city_paths():
+    """
+    Returns the data files of every city, the default city first and the cities of path_cities by name
+    """
+    dict_paths = {default_city: manifest_paths(os.path.dirname(path_data))}
+    if os.path.isdir(path_cities):
+        for city in sorted(os.listdir(path_cities)):
+            paths = manifest_paths(os.path.join(path_cities, city))
+            if city != default_city and all(os.path.isfile(path) for path in paths):
+                dict_paths[city] = paths
+    return dict_paths
+
+def city_bundles(city, bundles=path_bundles):
+    """
+    Returns the directory of the bundles of a city
+    """
+    return os.path.join(bundles, city)
+
+def main():
+    parser = argparse.ArgumentParser(description='Publishes a version of the data files of a city directory')
+    parser.add_argument('directory', help='data for the default city, or a directory of BRL_CITIES_DIR')
+    parser.add_argument('--version', required=True)
+    for name in manifest_files:
+        parser.add_argument(f'--{name.replace("_", "-")}', dest=name, help=f'file name of the {name} csv')
+    args = parser.parse_args()
+
+    files = {name: getattr(args, name) for name in manifest_files if getattr(args, name)}
+    print(json.dumps(publish(args.directory, args.version, **files), ensure_ascii=False, indent=1))
+
+if __name__ == '__main__':
+    main()
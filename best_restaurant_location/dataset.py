@@ -0,0 +1,602 @@
+"""
+The data of the app and everything derived from it, compiled once into a versioned bundle
+Usage: python -m best_restaurant_location.dataset [--bundles bundles] [--city Geneva ...]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import fcntl
+except ImportError:
+    # no file locks (windows): the bundles are not held and old versions are not pruned
+    fcntl = None
+
+from best_restaurant_location.cities import city_bundles, city_paths
+from best_restaurant_location.maps import convex_hull
+from best_restaurant_location.params import dict_rest, path_bundles, bundle_chunksize
+from best_restaurant_location.scoring import load_data
+from best_restaurant_location.timing import span
+
+logger = logging.getLogger(__name__)
+
+# Version of the bundle layout, bundles of another format are not loaded
+bundle_format = 5
+
+# Lock file of a bundle: every process that may load the bundle holds a shared lock on it, the compilation
+# writing it an exclusive one, and a bundle is only pruned once its lock is free
+bundle_lock = '.lock'
+
+# Columns of the restaurants held as category codes, and the ones with a filter index
+category_columns = ['district', 'combined_main_category', 'combined_main_category_2', 'sub_category']
+index_columns = ['district', 'combined_main_category_2', 'combined_main_category']
+
+# Size in pixels of the maps of the app, and zooms of the derived zoom tables
+map_width, map_height = 700, 500
+min_zoom, max_zoom = 10, 15.4
+
+# Columns of the aggregate cube: restaurants, and sum and count of the known reviews and ratings
+# per district cluster and category
+cube_keys = ['district', 'district_cluster', 'combined_main_category_2', 'combined_main_category']
+
+
+class Dataset:
+    """
+    The restaurants, cluster centers and districts of the app, with what the stages derive from them:
+    - indexes: for each index column, its categories and the rows of every category (postings)
+    - cube: restaurants, reviews and ratings summed per district cluster and category, which answers
+      the scoring aggregates without scanning the restaurants
+    - hulls: vertices of the convex hull of every district cluster, by district cluster
+    - config: the selections the data can answer and the codes of their filters, see config_of
+    Built from the csv files by build(), or memory-mapped from a compiled bundle by load_bundle()
+    Shared by all sessions, callers must not modify it
+    """
+    def __init__(self, data, cluster_centers, districts, indexes, cube, hulls, config, version):
+        self.data = data
+        self.cluster_centers = cluster_centers
+        self.districts = districts
+        self.indexes = indexes
+        self.cube = cube
+        self.hulls = hulls
+        self.config = config
+        self.lookup = config_codes(config)
+        self.version = version
+
+    def rows(self, column, codes):
+        """
+        Returns the rows of the categories codes of an index column, unsorted
+        """
+        categories, order, offsets = self.indexes[column]
+        return np.concatenate([order[offsets[code]:offsets[code + 1]] for code in codes] or [order[:0]])
+
+    def codes(self, column, value, contains=False):
+        """
+        Returns the codes of the categories of an index column equal to value, or containing it
+        like str.contains does
+        The values of the menu are looked up in the config, only other values are searched
+        """
+        codes = self.lookup[column].get(value)
+        if codes is not None:
+            return codes
+        categories = self.indexes[column][0]
+        if contains:
+            return np.flatnonzero(categories.str.contains(value))
+        return np.flatnonzero(categories == value)
+
+    def filter(self, rest_district, rest_category_main, rest_category):
+        """
+        Same rows as scoring.filter_data, looked up in the indexes: the rows of the most selective
+        condition are read from its postings and checked against the other conditions
+        """
+        with span('filter_data', rows=len(self.data)):
+            conditions = []
+            if rest_district != 'All':
+                conditions.append(('district', self.codes('district', rest_district)))
+            if rest_category_main != 'All':
+                conditions.append(('combined_main_category_2', self.codes('combined_main_category_2',
+                                                                          rest_category_main)))
+            if rest_category != 'All':
+                conditions.append(('combined_main_category', self.codes('combined_main_category', rest_category,
+                                                                        contains=True)))
+            if not conditions:
+                return self.data.reset_index(drop=True)
+
+            def count(condition):
+                offsets = self.indexes[condition[0]][2]
+                return sum(offsets[code + 1] - offsets[code] for code in condition[1])
+
+            conditions.sort(key=count)
+            rows = self.rows(*conditions[0])
+            for column, codes in conditions[1:]:
+                rows = rows[np.isin(self.data[column].array.codes[rows], codes)]
+            rows.sort()
+            return self.data.take(rows).reset_index(drop=True)
+
+    def aggregate(self, data, rest_district, rest_category_main, rest_category):
+        """
+        Same frame as scoring.filter_data_scoring, summed from the cube, data is not read
+        The keys of the cube have the categories of the restaurants, so they are filtered by the same codes
+        """
+        cube = self.cube
+        mask = np.ones(len(cube), dtype=bool)
+        if rest_district != 'All':
+            mask &= np.isin(cube['district'].array.codes, self.codes('district', rest_district))
+        if rest_category_main != 'All':
+            mask &= np.isin(cube['combined_main_category_2'].array.codes,
+                            self.codes('combined_main_category_2', rest_category_main))
+        if rest_category != 'All':
+            mask &= np.isin(cube['combined_main_category'].array.codes,
+                            self.codes('combined_main_category', rest_category, contains=True))
+
+        sums = cube[mask].groupby(['district', 'district_cluster'], observed=True)\
+            [['restaurants', 'reviews_sum', 'reviews_count', 'rating_sum', 'rating_count']].sum()
+        df = pd.DataFrame({f'{rest_category.lower()}_restaurants': sums['restaurants'],
+                           'user_ratings_total': sums['reviews_sum'] / sums['reviews_count'],
+                           'combined_rating': sums['rating_sum'] / sums['rating_count']})
+        return df.reset_index()
+
+def build_index(codes, n_categories):
+    """
+    Returns the postings of category codes: the rows of code c are order[offsets[c]:offsets[c + 1]],
+    rows without a value are left out
+    """
+    order = np.argsort(codes, kind='stable')[np.count_nonzero(codes < 0):]
+    offsets = np.concatenate([[0], np.bincount(codes[codes >= 0], minlength=n_categories).cumsum()])
+    return order, offsets
+
+def aggregate_cube(data):
+    """
+    Returns the cube of the restaurants data, the cubes of parts of the restaurants add up to theirs
+    """
+    return data.groupby(cube_keys, observed=True, dropna=False).agg(
+        restaurants=('place_id', 'count'),
+        reviews_sum=('user_ratings_total', 'sum'),
+        reviews_count=('user_ratings_total', 'count'),
+        rating_sum=('combined_rating', 'sum'),
+        rating_count=('combined_rating', 'count')).reset_index()
+
+def config_of(categories, cube, districts):
+    """
+    Returns the config of the app compiled from the data, from the categories of the index columns,
+    the cube and the districts frame:
+    - codes: the codes of the filter indexes of every district, main category and sub category of the menu,
+      a sub category matches the cuisine labels containing it like scoring.filter_data
+    - menu: the restaurants of every (main category, sub category, district) selection of params.dict_rest
+      that has restaurants, districts in the order of the districts file. The app only offers these selections
+    Codes and counts are python ints and keys strings, so that the config reads back from json unchanged
+    """
+    cuisines = categories['combined_main_category']
+    codes = {'district': {name: [code] for code, name in enumerate(categories['district'])},
+             'combined_main_category_2': {name: [code]
+                                          for code, name in enumerate(categories['combined_main_category_2'])},
+             'combined_main_category': {sub: np.flatnonzero(cuisines.str.contains(sub)).tolist()
+                                        for subs in dict_rest.values() for sub in subs if sub != 'All'}}
+
+    restaurants = cube['restaurants'].to_numpy()
+    cube_codes = {column: cube[column].array.codes for column in index_columns}
+    list_district = [(district, codes['district'][district][0]) for district in districts['district']
+                     if district in codes['district']]
+    menu = {}
+    for main, subs in dict_rest.items():
+        main_mask = np.ones(len(cube), dtype=bool) if main == 'All' else \
+            np.isin(cube_codes['combined_main_category_2'], codes['combined_main_category_2'].get(main, []))
+        entry = {}
+        for sub in subs:
+            mask = main_mask if sub == 'All' else \
+                main_mask & np.isin(cube_codes['combined_main_category'], codes['combined_main_category'][sub])
+            total = int(restaurants[mask].sum())
+            if not total:
+                continue
+            district_codes = cube_codes['district'][mask]
+            known = district_codes >= 0
+            by_district = np.bincount(district_codes[known], weights=restaurants[mask][known],
+                                      minlength=len(categories['district']))
+            entry[sub] = {'All': total}
+            entry[sub].update({district: int(by_district[code]) for district, code in list_district
+                               if by_district[code]})
+        if entry:
+            menu[main] = entry
+
+    return {'codes': codes, 'menu': menu}
+
+def config_codes(config):
+    """
+    Returns the codes of a config as arrays, by index column and value
+    """
+    return {column: {value: np.array(codes, dtype=np.int64) for value, codes in values.items()}
+            for column, values in config['codes'].items()}
+
+def district_extents(data):
+    """
+    Returns the bounding box of the restaurants of every district and of 'All', the extents of parts
+    of the restaurants combine with combine_extents
+    """
+    coordinates = data[['district', 'geometry.location.lat', 'geometry.location.lng']]
+    coordinates = pd.concat([coordinates.assign(district='All'), coordinates.astype({'district': str})])
+    return coordinates.groupby('district').agg(lat_min=('geometry.location.lat', 'min'),
+                                               lat_max=('geometry.location.lat', 'max'),
+                                               lng_min=('geometry.location.lng', 'min'),
+                                               lng_max=('geometry.location.lng', 'max'))
+
+def combine_extents(extents):
+    return pd.concat(extents).groupby(level=0).agg({'lat_min': 'min', 'lat_max': 'max',
+                                                    'lng_min': 'min', 'lng_max': 'max'})
+
+def district_zoom(districts, extents):
+    """
+    Returns districts with its zoom column, the zoom table of the maps: the zoom of the districts file
+    where it has one, otherwise the largest zoom showing the whole bounding box of the district
+    """
+    extents = extents.reindex(districts['district'])
+    lat = np.radians((extents['lat_min'] + extents['lat_max']) / 2)
+    # a web mercator tile of 256 pixels spans 360 degrees of longitude at zoom 0
+    zoom_lng = np.log2(map_width * 360 / (256 * (extents['lng_max'] - extents['lng_min'])))
+    zoom_lat = np.log2(map_height * 360 * np.cos(lat) / (256 * (extents['lat_max'] - extents['lat_min'])))
+    zoom = np.fmin(zoom_lng, zoom_lat).clip(min_zoom, max_zoom).fillna(max_zoom).round(1).to_numpy()
+    if 'zoom' in districts:
+        zoom = districts['zoom'].fillna(pd.Series(zoom, index=districts.index))
+    return districts.assign(zoom=zoom)
+
+def build(data, cluster_centers, districts, version):
+    """
+    Derives the indexes, the cube, the hulls, the zoom table and the config of the loaded frames
+    """
+    data = data.copy()
+    for column in category_columns:
+        data[column] = data[column].astype('category')
+
+    indexes = {}
+    for column in index_columns:
+        categories = data[column].cat.categories
+        indexes[column] = (categories, *build_index(data[column].cat.codes.to_numpy(), len(categories)))
+
+    cube = aggregate_cube(data)
+
+    hulls = {}
+    for cluster, points in data.groupby('district_cluster')[['geometry.location.lat', 'geometry.location.lng']]:
+        form = convex_hull(points.to_numpy())
+        if form is not None:
+            hulls[int(cluster)] = [[float(lat), float(lng)] for lat, lng in form]
+
+    districts = district_zoom(districts, district_extents(data))
+    config = config_of({column: index[0] for column, index in indexes.items()}, cube, districts)
+
+    return Dataset(data, cluster_centers, districts, indexes, cube, hulls, config, version)
+
+def build_from_csv(path_data, path_cluster_centers, path_district):
+    """
+    Loads the csv files and derives the rest, what the app does when no bundle is compiled
+    """
+    data, df_cluster_centers, df_district = load_data(path_data, path_cluster_centers, path_district)
+    with span('build_dataset', rows=len(data)):
+        return build(data, df_cluster_centers, df_district, version='csv')
+
+def source_version(paths):
+    """
+    Returns the version of a bundle of the files at paths, a hash of their content and of the bundle format
+    """
+    digest = hashlib.sha256(f'format {bundle_format}'.encode())
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+def source_stats(paths):
+    """
+    Returns the size and modification time of the files at paths, as recorded in the manifest of a bundle
+    """
+    return {path: {'bytes': os.path.getsize(path), 'mtime': os.path.getmtime(path)} for path in paths}
+
+def write_frame(directory, df):
+    """
+    Writes a frame as one file per column: numeric columns and category codes as .npy, their categories
+    as .json, and strings as their utf-8 bytes back to back with the .npy of their offsets, the layout
+    of an arrow large_string array
+    Returns the column specs of the manifest
+    """
+    os.makedirs(directory)
+    columns = {}
+    for column in df.columns:
+        series = df[column]
+        path = os.path.join(directory, column)
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            np.save(f'{path}.npy', series.cat.codes.to_numpy())
+            with open(f'{path}.json', 'w', encoding='utf-8') as f:
+                json.dump(series.cat.categories.tolist(), f, ensure_ascii=False)
+            columns[column] = 'category'
+        elif pd.api.types.is_numeric_dtype(series.dtype):
+            np.save(f'{path}.npy', series.to_numpy())
+            columns[column] = 'numeric'
+        else:
+            if series.isna().any():
+                raise ValueError(f'column {column} holds missing values, it cannot be written as text')
+            encoded = series.str.encode('utf-8')
+            np.save(f'{path}.offsets.npy', np.concatenate([[0], encoded.str.len().cumsum()]).astype(np.int64))
+            with open(f'{path}.utf8', 'wb') as f:
+                f.write(b''.join(encoded))
+            columns[column] = 'text'
+    return columns
+
+def load_text(path):
+    """
+    Returns a string column written by write_frame
+    With pyarrow the strings are read in place from the memory-mapped files, like the numeric columns,
+    so processes loading the same bundle share them
+    """
+    offsets = np.load(f'{path}.offsets.npy', mmap_mode='r')
+    size = os.path.getsize(f'{path}.utf8')
+    blob = np.memmap(f'{path}.utf8', dtype=np.uint8, mode='r') if size else np.zeros(0, dtype=np.uint8)
+    if pa is not None:
+        array = pa.LargeStringArray.from_buffers(len(offsets) - 1, pa.py_buffer(offsets), pa.py_buffer(blob))
+        return pd.arrays.ArrowStringArray(pa.chunked_array([array], type=pa.large_string()),
+                                          dtype=pd.StringDtype('pyarrow', na_value=np.nan))
+    text = blob.tobytes()
+    return pd.array([text[start:end].decode('utf-8') for start, end in zip(offsets[:-1], offsets[1:])], dtype=str)
+
+def load_frame(directory, columns):
+    """
+    Reads a frame written by write_frame, numeric columns, category codes (and strings with pyarrow)
+    stay memory-mapped
+    """
+    dict_columns = {}
+    for column, kind in columns.items():
+        path = os.path.join(directory, column)
+        if kind == 'numeric':
+            dict_columns[column] = np.load(f'{path}.npy', mmap_mode='r')
+        elif kind == 'category':
+            with open(f'{path}.json', encoding='utf-8') as f:
+                categories = pd.CategoricalDtype(json.load(f))
+            dict_columns[column] = pd.Categorical.from_codes(np.load(f'{path}.npy', mmap_mode='r'),
+                                                             dtype=categories, validate=False)
+        else:
+            dict_columns[column] = load_text(path)
+    return pd.DataFrame(dict_columns, copy=False)
+
+def write_shapes(directory, hulls, config):
+    """
+    Writes the hulls as GeoJSON and the config as json into a bundle directory
+    """
+    # GeoJSON rings are closed and list longitude first
+    features = [{'type': 'Feature',
+                 'properties': {'district_cluster': int(cluster)},
+                 'geometry': {'type': 'Polygon', 'coordinates': [[[lng, lat] for lat, lng in form + form[:1]]]}}
+                for cluster, form in hulls.items()]
+    with open(os.path.join(directory, 'hulls.geojson'), 'w', encoding='utf-8') as f:
+        json.dump({'type': 'FeatureCollection', 'features': features}, f)
+
+    with open(os.path.join(directory, 'config.json'), 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False, indent=1)
+
+def write_manifest(directory, version, sources, rows, frames):
+    """
+    Writes the manifest of a bundle: its format and version, the files it was compiled from and the
+    column specs of its frames
+    """
+    manifest = {'format': bundle_format,
+                'version': version,
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'sources': source_stats(sources),
+                'rows': rows,
+                'frames': frames}
+    with open(os.path.join(directory, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+
+def write_bundle(dataset, directory, sources):
+    """
+    Writes a dataset as a bundle under directory, with a manifest describing its files and sources
+    """
+    frames = {'data': dataset.data, 'cluster_centers': dataset.cluster_centers,
+              'districts': dataset.districts, 'cube': dataset.cube}
+    frames = {name: write_frame(os.path.join(directory, name), df) for name, df in frames.items()}
+
+    os.makedirs(os.path.join(directory, 'indexes'))
+    for column, (categories, order, offsets) in dataset.indexes.items():
+        np.save(os.path.join(directory, 'indexes', f'{column}.order.npy'), order)
+        np.save(os.path.join(directory, 'indexes', f'{column}.offsets.npy'), offsets)
+
+    write_shapes(directory, dataset.hulls, dataset.config)
+
+    # the restaurants once more as a SQLite database, read by the sqlite backend (BRL_BACKEND=sqlite)
+    from best_restaurant_location.sqlstore import sqlite_name, write_sqlite
+    write_sqlite(dataset, os.path.join(directory, sqlite_name))
+
+    write_manifest(directory, dataset.version, sources, len(dataset.data), frames)
+
+def load_bundle_parts(directory, frame_names):
+    """
+    Reads the manifest of the bundle in directory and memory-maps its frames frame_names
+    Returns the manifest, the frames by name, the hulls and the config
+    """
+    with open(os.path.join(directory, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest['format'] != bundle_format:
+        raise ValueError(f'bundle {directory} has format {manifest["format"]}, expected {bundle_format}')
+    for path, stat in manifest['sources'].items():
+        if os.path.isfile(path) and (os.path.getsize(path), os.path.getmtime(path)) != (stat['bytes'], stat['mtime']):
+            logger.warning('%s changed since bundle %s was compiled, run make bundle', path, manifest['version'])
+
+    frames = {name: load_frame(os.path.join(directory, name), manifest['frames'][name]) for name in frame_names}
+
+    with open(os.path.join(directory, 'hulls.geojson'), encoding='utf-8') as f:
+        hulls = {feature['properties']['district_cluster']: [[lat, lng] for lng, lat in
+                                                             feature['geometry']['coordinates'][0][:-1]]
+                 for feature in json.load(f)['features']}
+    with open(os.path.join(directory, 'config.json'), encoding='utf-8') as f:
+        config = json.load(f)
+    return manifest, frames, hulls, config
+
+def bundle_matches(directory, paths):
+    """
+    Returns whether the bundle in directory has the current format and was compiled from the files at paths
+    as they are now
+    """
+    with open(os.path.join(directory, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    return manifest['format'] == bundle_format and manifest['sources'] == source_stats(paths)
+
+def load_bundle(directory):
+    """
+    Memory-maps a bundle written by write_bundle and returns its Dataset
+    """
+    manifest, frames, hulls, config = load_bundle_parts(directory, ['data', 'cluster_centers', 'districts', 'cube'])
+
+    indexes = {}
+    for column in index_columns:
+        path = os.path.join(directory, 'indexes', column)
+        indexes[column] = (frames['data'][column].cat.categories,
+                           np.load(f'{path}.order.npy', mmap_mode='r'),
+                           np.load(f'{path}.offsets.npy', mmap_mode='r'))
+
+    return Dataset(frames['data'], frames['cluster_centers'], frames['districts'], indexes, frames['cube'],
+                   hulls, config, manifest['version'])
+
+def compile_bundle(paths, bundles, chunksize=None):
+    """
+    Compiles the csv files at paths into bundles/<version>/ and points bundles/CURRENT to it
+    With chunksize the restaurants are read chunksize rows at a time (chunked.write_bundle_chunked),
+    otherwise at once
+    Returns the directory of the bundle, an existing bundle of the same files is reused
+    """
+    version = source_version(paths)
+    directory = os.path.join(bundles, version)
+    if os.path.isdir(directory):
+        set_current(bundles, version)
+        return directory
+
+    # written aside and renamed, so a reader never sees half a bundle. The processes of a host may
+    # compile the same version at once, each one writes its own directory
+    tmp = os.path.join(bundles, f'.{version}.{os.getpid()}.{uuid.uuid4().hex}.tmp')
+    os.makedirs(tmp)
+    with open(os.path.join(tmp, bundle_lock), 'w') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        if chunksize:
+            from best_restaurant_location.chunked import write_bundle_chunked
+            stats = write_bundle_chunked(paths, tmp, version, chunksize)
+            logger.info('compiled %d restaurants in %.1f s, %d rows/s', stats['rows'], stats['seconds'],
+                        stats['rows_per_second'])
+        else:
+            dataset = build_from_csv(*paths)
+            dataset.version = version
+            write_bundle(dataset, tmp, paths)
+        try:
+            os.rename(tmp, directory)
+        except OSError:
+            if not os.path.isdir(directory):
+                raise
+            # another process renamed the same version first, its bundle is used
+            shutil.rmtree(tmp)
+        # made current while still locked, so that no process prunes it meanwhile
+        set_current(bundles, version)
+    return directory
+
+def set_current(bundles, version):
+    """
+    Points bundles/CURRENT to version, the file is replaced at once
+    """
+    current = os.path.join(bundles, 'CURRENT')
+    tmp = f'{current}.{os.getpid()}.{uuid.uuid4().hex}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(tmp, current)
+
+def hold_bundle(directory):
+    """
+    Takes a shared lock on the bundle in directory, so that no process prunes it while this one may load it
+    Returns the open lock file, closing it releases the lock, or None without file locks
+    Raises FileNotFoundError when the bundle was pruned meanwhile
+    """
+    if fcntl is None:
+        return None
+    lock = open(os.path.join(directory, bundle_lock), 'a')
+    fcntl.flock(lock, fcntl.LOCK_SH)
+    if not os.path.isfile(os.path.join(directory, 'manifest.json')):
+        # pruned between the open and the lock
+        lock.close()
+        raise FileNotFoundError(f'bundle {directory} was pruned')
+    return lock
+
+def prune_bundles(bundles):
+    """
+    Removes the bundles of bundles that no process holds, except the current one, and the directories of
+    the compilations that stopped halfway. Bundles in /dev/shm take memory until they are removed
+    Returns the removed directories
+    """
+    if fcntl is None or not os.path.isdir(bundles):
+        return []
+    current = current_bundle(bundles)
+    removed = []
+    for name in sorted(os.listdir(bundles)):
+        directory = os.path.join(bundles, name)
+        if directory == current or not os.path.isdir(directory):
+            continue
+        try:
+            # a running compilation holds the lock it created first in its directory
+            lock = open(os.path.join(directory, bundle_lock), 'r' if name.startswith('.') else 'a')
+        except FileNotFoundError:
+            continue
+        with lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue
+            # removed while locked, a process taking the lock afterwards finds no manifest
+            shutil.rmtree(directory, ignore_errors=True)
+        removed.append(directory)
+    if removed:
+        logger.info('pruned %s', ', '.join(removed))
+    return removed
+
+def current_bundle(bundles):
+    """
+    Returns the directory of the current bundle, or None when none was compiled
+    """
+    try:
+        with open(os.path.join(bundles, 'CURRENT'), encoding='utf-8') as f:
+            directory = os.path.join(bundles, f.read().strip())
+    except FileNotFoundError:
+        return None
+    return directory if os.path.isdir(directory) else None
+
+def main():
+    parser = argparse.ArgumentParser(description='Compiles the data files of every city into a versioned bundle '
+                                                 'loaded by the app')
+    parser.add_argument('--bundles', default=path_bundles)
+    parser.add_argument('--city', nargs='+', help='cities to compile, all of them by default')
+    parser.add_argument('--chunksize', type=int, default=bundle_chunksize,
+                        help='restaurants read at once, 0 reads the whole file')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    dict_paths = city_paths()
+    for city in args.city or dict_paths:
+        if city not in dict_paths:
+            parser.error(f'unknown city {city}, the cities are {", ".join(dict_paths)}')
+        start = time.perf_counter()
+        directory = compile_bundle(dict_paths[city], city_bundles(city, args.bundles), args.chunksize)
+        seconds = time.perf_counter() - start
+        with open(os.path.join(directory, 'manifest.json'), encoding='utf-8') as f:
+            rows = json.load(f)['rows']
+        size = sum(os.path.getsize(os.path.join(root, name))
+                   for root, dirs, files in os.walk(directory) for name in files)
+        print(f'{city} {directory}: {rows} restaurants, {size / 2**20:.1f} MB in {seconds:.1f} s '
+              f'({rows / seconds:,.0f} rows/s)')
+        for pruned in prune_bundles(city_bundles(city, args.bundles)):
+            print(f'{city} {pruned}: pruned, no app holds it')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pydeck as pdk
+
+from best_restaurant_location.maps import classify
+from best_restaurant_location.params import dict_rgb
+
+
+def point_frame(df, spec=None):
+    """
+    Returns the columns handed to deck.gl: rounded coordinates, rgb color and popup html
+    Colors come from the bins of spec with one palette lookup, restaurants outside every bin are dropped
+    """
+    if spec is None:
+        rgb = np.tile(dict_rgb['blue'], (len(df), 1))
+        keep = np.ones(len(df), dtype=bool)
+    else:
+        bins = classify(df, spec)
+        palette = np.array([dict_rgb[color] for label, legend_color, color in spec['bins']], dtype=np.uint8)
+        keep = bins >= 0
+        rgb = palette[bins[keep]]
+
+    return pd.DataFrame({'lng': df['geometry.location.lng'].to_numpy()[keep].round(5),
+                         'lat': df['geometry.location.lat'].to_numpy()[keep].round(5),
+                         'r': rgb[:, 0],
+                         'g': rgb[:, 1],
+                         'b': rgb[:, 2],
+                         'popup_html': df['popup_html'].to_numpy()[keep]})
+
+def build_deck(df, location, zoom, spec=None):
+    """
+    Restaurants as a WebGL scatterplot layer, colored by the bins of spec
+    deck.gl tiles are 512 px where leaflet's are 256 px, hence the zoom offset of one
+    """
+    layer = pdk.Layer('ScatterplotLayer',
+                      data=point_frame(df, spec),
+                      get_position='[lng, lat]',
+                      get_fill_color='[r, g, b, 160]',
+                      get_radius=4,
+                      radius_units='pixels',
+                      pickable=True)
+    view_state = pdk.ViewState(latitude=location[0], longitude=location[1], zoom=zoom - 1)
+    return pdk.Deck(layers=[layer], initial_view_state=view_state, map_style='light',
+                    tooltip={'html': '{popup_html}'})
@@ -0,0 +1,245 @@
+import folium
+import folium.plugins
+import numpy as np
+from branca.element import MacroElement
+from jinja2 import Template
+
+from best_restaurant_location.params import dict_price, dict_bins
+from best_restaurant_location.timing import span
+
+
+# Coordinates of compact maps are sent as integers of 1e-5 degree, about 1 m
+COORD_SCALE = 100000
+
+class CompactPoints(MacroElement):
+    """
+    Adds one marker per point to its parent layer, from delta encoded integer coordinates
+    and a single list of popups, instead of one folium object and script block per point
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var lat = {{ this.lat|tojson }};
+            var lng = {{ this.lng|tojson }};
+            var popups = {{ this.popups|tojson }};
+            var options = {{ this.options|tojson }};
+            var layer = {{ this._parent.get_name() }};
+            var y = 0, x = 0;
+            for (var i = 0; i < lat.length; i++) {
+                y += lat[i];
+                x += lng[i];
+                var point = [y / {{ this.scale }}, x / {{ this.scale }}];
+                {%- if this.marker %}
+                var marker = L.marker(point, options);
+                {%- else %}
+                var marker = L.circleMarker(point, options);
+                {%- endif %}
+                marker.bindPopup(popups[i], {maxWidth: {{ this.popup_width }}});
+                layer.addLayer(marker);
+            }
+        })();
+        {% endmacro %}
+        """)
+
+    def __init__(self, lat, lng, popups, marker=False, popup_width=120, **options):
+        super().__init__()
+        self._name = 'CompactPoints'
+        self.lat = delta_encode(lat)
+        self.lng = delta_encode(lng)
+        self.popups = list(popups)
+        self.marker = marker
+        self.popup_width = popup_width
+        self.options = options
+        self.scale = COORD_SCALE
+
+def delta_encode(values):
+    """
+    Quantizes coordinates to COORD_SCALE and returns the differences between consecutive points
+    """
+    quantized = np.round(np.asarray(values, dtype=float) * COORD_SCALE).astype(np.int64)
+    return np.diff(quantized, prepend=0).tolist()
+
+def base_map(location, zoom, tiles='cartodbpositron', layer_name=None, compact=False):
+    """
+    Creates an empty map centered on location
+    If layer_name is given, the tiles are added as a named layer for the layer control
+    Compact maps only link leaflet itself, the maps do not use the jquery, bootstrap and
+    font awesome assets folium links by default
+    """
+    if layer_name is None:
+        map_object = folium.Map(location=location, zoom_start=zoom, tiles=tiles)
+    else:
+        map_object = folium.Map(location=location, zoom_start=zoom, tiles=None)
+        folium.TileLayer(tiles, name=layer_name).add_to(map_object)
+
+    if compact:
+        map_object.default_js = [js for js in map_object.default_js if js[0] == 'leaflet']
+        map_object.default_css = [css for css in map_object.default_css if css[0] == 'leaflet_css']
+    return map_object
+
+def add_points(layer, df, compact, marker=False, **options):
+    """
+    Adds a marker (or a circle marker with options) for every restaurant of df to layer
+    """
+    if compact:
+        CompactPoints(df['geometry.location.lat'], df['geometry.location.lng'], df['popup_html'],
+                      marker=marker, **options).add_to(layer)
+        return layer
+
+    for lat, lng, popup in zip(df['geometry.location.lat'], df['geometry.location.lng'], df['popup_html']):
+        popup = folium.Popup(popup, max_width='120')
+        if marker:
+            folium.Marker(location=[lat, lng], popup=popup).add_to(layer)
+        else:
+            folium.CircleMarker(location=[lat, lng], popup=popup, **options).add_to(layer)
+    return layer
+
+def render_map(map_object):
+    """
+    Serializes a map to the standalone html page embedded in the app
+    """
+    with span('render_map') as record:
+        html = folium.Figure().add_child(map_object).render()
+        record['bytes'] = len(html.encode('utf-8'))
+    return html
+
+def restaurant_popup_html(data):
+    """
+    Returns the popup html of every restaurant as a string column
+    Computed once when the data is loaded, the map builders only look it up
+    """
+    return ("<b>" + data['name'] + "</b><br>"
+            + "Price Level: " + data['price_level_combined'].map(dict_price).fillna('-') + "<br>"
+            + "Review Score: " + data['combined_rating'].astype(str).fillna('nan') + "<br>"
+            + "# of Reviews: " + data['user_ratings_total'].astype(str).fillna('nan'))
+
+def location_popup(i, row, label, rest_category):
+    """
+    Returns the popup shown on a best / worst location polygon
+    """
+    str_comp = f"{row['all_restaurants']}"
+    if rest_category != 'All':
+        col = f'{rest_category.lower()}_restaurants'
+        str_comp += f" ({int(row[col])} Direct)"
+
+    return folium.Popup(f"<b>#{i+1} {label} Location</b><br>"
+                        f"District: {row['district']}<br>"
+                        f"Competitors: {str_comp}<br>"
+                        f"Avg. Review Score: {round(row['combined_rating'],1)}<br>"
+                        f"Avg. # of Reviews: {int(row['user_ratings_total'])}",
+                        max_width='200')
+
+def convex_hull(list_of_points):
+    """
+    Returns the vertices of the convex hull of the points, or None for less than 3 points or points
+    without an area (all equal or on one line)
+    """
+    # Since it is pointless to draw a convex hull polygon around less than 3 points check len of input
+    if len(list_of_points) <= 2:
+        return None
+
+    # Create the convex hull using scipy.spatial, imported here as only the location map needs it
+    from scipy.spatial import ConvexHull, QhullError
+    with span('convexhull', rows=len(list_of_points)):
+        try:
+            hull = ConvexHull(list_of_points)
+        except QhullError:
+            # qhull fails on a flat input, e.g. restaurants of a cluster sharing one address
+            return None
+        return [list_of_points[i] for i in hull.vertices]
+
+def add_hull_polygon(map_object, form, layer_name, line_color, fill_color, weight, text):
+    """
+    Adds the polygon of a convex hull to the map in its own feature group
+    """
+    fg = folium.FeatureGroup(name=layer_name)
+    fg.add_child(folium.vector_layers.Polygon(locations=form, color=line_color, fill_color=fill_color,
+                                              weight=weight, stroke=False, popup=(text)))
+    map_object.add_child(fg)
+    return map_object
+
+def create_convexhull_polygon(map_object, list_of_points, layer_name, line_color, fill_color, weight, text):
+    form = convex_hull(list_of_points)
+    if form is not None:
+        add_hull_polygon(map_object, form, layer_name, line_color, fill_color, weight, text)
+
+    return (map_object)
+
+## Map 01 - Overview
+def build_overview_map(df, location, zoom, compact=False):
+    """
+    Clustered markers for every restaurant of the selection
+    """
+    map_object = base_map(location, zoom, compact=compact)
+    marker_cluster = folium.plugins.MarkerCluster().add_to(map_object)
+    add_points(marker_cluster, df, compact, marker=True)
+
+    return map_object
+
+def classify(df, spec):
+    """
+    Returns the bin index of every row for a bin spec of params.dict_bins
+    Rows without a value get -1
+    """
+    values = df[spec['column']].to_numpy(dtype=float)
+    bins = np.digitize(values, spec['edges'])
+    bins[np.isnan(values)] = -1
+    return bins
+
+def build_binned_map(df, spec, location, zoom, compact=False):
+    """
+    Restaurants colored by the bins of spec, with one layer per bin
+    """
+    map_object = base_map(location, zoom, layer_name=spec['layer'], compact=compact)
+    groups = [folium.FeatureGroup(name=f"<span style='color:{legend_color}'>{label}</span>")
+              for label, legend_color, color in spec['bins']]
+
+    bins = classify(df, spec)
+    for b, (label, legend_color, color) in enumerate(spec['bins']):
+        add_points(groups[b], df[bins==b], compact,
+                   radius=4, color=color, fillColor=color, fill=spec['fill'], opacity=0.5)
+
+    for group in (groups[::-1] if spec['legend_descending'] else groups):
+        group.add_to(map_object)
+    folium.map.LayerControl('topright', collapsed=False).add_to(map_object)
+
+    return map_object
+
+## Map 02 - Price Levels
+def build_price_map(df, location, zoom, compact=False):
+    return build_binned_map(df, dict_bins['price'], location, zoom, compact)
+
+## Map 03 - Review Scores
+def build_rating_map(df, location, zoom, compact=False):
+    return build_binned_map(df, dict_bins['rating'], location, zoom, compact)
+
+## Map 04 - Number of Reviews
+def build_reviews_map(df, location, zoom, compact=False):
+    return build_binned_map(df, dict_bins['reviews'], location, zoom, compact)
+
+## Map 05 - Best / Worst Location
+def build_location_map(data, best_locations, worst_locations, rest_category, location, zoom, compact=False,
+                       hulls=None):
+    """
+    Convex hulls around the best (green) and worst (red) district clusters
+    hulls maps district clusters to their precomputed hull vertices, when not given they are computed from data
+    """
+    map_object = base_map(location, zoom, compact=compact)
+
+    for locations, label, color in [(best_locations, 'Best', 'green'), (worst_locations, 'Worst', 'red')]:
+        for i, row in locations.iterrows():
+            popup = location_popup(i, row, label, rest_category)
+            cluster = row['district_cluster']
+            if hulls is not None:
+                form = hulls.get(cluster)
+            else:
+                list_of_points = data[data['district_cluster']==cluster][['geometry.location.lat','geometry.location.lng']].to_numpy()
+                form = convex_hull(list_of_points)
+            if form is not None:
+                add_hull_polygon(map_object, form, layer_name=f'{label} Locations',
+                                 line_color=color,
+                                 fill_color=color,
+                                 weight=1,
+                                 text=popup)
+
+    return map_object
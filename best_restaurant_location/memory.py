@@ -0,0 +1,117 @@
+"""
+Memory accounting: deep size of the loaded frames per column, size of the cache entries and
+tracemalloc peak of one full rerun by stage
+Usage: python -m best_restaurant_location.memory [--city Geneva] [--district All --main All --sub All]
+"""
+import argparse
+import tracemalloc
+
+import pandas as pd
+
+from best_restaurant_location import timing
+from best_restaurant_location.cache import LRUCache
+from best_restaurant_location.params import default_city
+from best_restaurant_location.pipeline import Pipeline
+from best_restaurant_location.stages import data_key, dict_cities, dict_map_builders, load_stage, filter_stage, map_view, \
+    restaurant_map_stage, location_map_stage
+from best_restaurant_location.warmup import default_weights
+
+
+def frame_memory(df):
+    """
+    Returns the deep memory of every column of df, largest first, with its share of the frame
+    and its number of distinct values, a column of mostly repeated strings stores each copy
+    """
+    usage = df.memory_usage(index=True, deep=True)
+    report = pd.DataFrame({'dtype': df.dtypes.astype(str).reindex(usage.index, fill_value='index'),
+                           'bytes': usage,
+                           'bytes per row': (usage / max(len(df), 1)).round(1),
+                           'share': (usage / usage.sum()).round(3),
+                           'distinct': [df.index.nunique() if column == 'Index' else df[column].nunique()
+                                        for column in usage.index]})
+    return report.sort_values('bytes', ascending=False)
+
+def cache_memory(cache):
+    """
+    Returns the size of every entry of cache, largest first, keys are shown with the city instead of its data files
+    Entries sharing buffers (e.g. the unfiltered restaurants and the loaded ones) are each counted in full
+    """
+    cities = {data_key(city): city for city in dict_cities}
+    rows = []
+    for (stage, key), size in cache.entry_sizes():
+        if key in cities:
+            key = cities[key]
+        elif isinstance(key, tuple) and key and key[0] in cities:
+            key = (cities[key[0]],) + key[1:]
+        rows.append({'stage': stage, 'key': repr(key)[:120], 'bytes': size})
+    return pd.DataFrame(rows, columns=['stage', 'key', 'bytes']).sort_values('bytes', ascending=False)
+
+def rerun_memory(selection, weights=default_weights, city=default_city):
+    """
+    Runs the stages of one rerun building all five maps, from empty caches and with tracemalloc on
+    Returns the timings of the rerun, with the peak memory of every span, and the cache it filled
+    """
+    cache = LRUCache(max_bytes=2**40)
+    pipeline = Pipeline({}, cache)
+
+    tracemalloc.start()
+    timings = timing.start(memory=True)
+    try:
+        with timing.span('rerun'):
+            dataset = load_stage(pipeline, city)
+            df = filter_stage(pipeline, dataset, selection)
+            location, zoom = map_view(dataset.districts, selection[0])
+            for name in dict_map_builders:
+                restaurant_map_stage(pipeline, dataset, name, df, selection, location, zoom)
+            location_map_stage(pipeline, dataset, selection, weights, location, zoom)
+    finally:
+        timing.stop()
+        tracemalloc.stop()
+    return timings, cache
+
+def report(selection, weights=default_weights, city=default_city):
+    """
+    Returns the memory accounting of one full rerun of selection in city as a dictionary of dataframes
+    """
+    timings, cache = rerun_memory(selection, weights, city)
+    dataset = cache.get(('load', data_key(city)))
+    data, df_cluster_centers, df_district = dataset.data, dataset.cluster_centers, dataset.districts
+
+    if data is None:
+        # the sqlite backend only holds the restaurants of the selection, in the cache entries
+        data = cache.get(('filter', (dataset.key, selection)))
+
+    stages = pd.DataFrame([{'stage': ' ' * record['depth'] + record['stage'],
+                            'ms': record['ms'],
+                            'peak_bytes': record['peak_bytes']} for record in timings.records])
+
+    entries = cache_memory(cache)
+    maps = entries[entries['stage'].str.startswith('map_')]
+    totals = pd.Series({'restaurants frame': int(data.memory_usage(index=True, deep=True).sum()),
+                        'popup_html column': int(data['popup_html'].memory_usage(index=False, deep=True)),
+                        'map html (5 maps)': int(maps['bytes'].sum()),
+                        'all cache entries': int(entries['bytes'].sum()),
+                        'rerun peak': int(timings.records[0]['peak_bytes'])}, name='bytes')
+
+    return {'totals': totals.to_frame(),
+            'restaurants by column': frame_memory(data),
+            'cluster centers by column': frame_memory(df_cluster_centers),
+            'districts by column': frame_memory(df_district),
+            'cache entries': entries,
+            'rerun peak by stage': stages}
+
+def main():
+    parser = argparse.ArgumentParser(description='Reports the memory used by the data, the caches and one rerun')
+    parser.add_argument('--city', default=default_city, choices=list(dict_cities))
+    parser.add_argument('--district', default='All')
+    parser.add_argument('--main', default='All')
+    parser.add_argument('--sub', default='All')
+    args = parser.parse_args()
+
+    with pd.option_context('display.width', 160, 'display.max_columns', 20, 'display.max_colwidth', 80):
+        for title, table in report((args.district, args.main, args.sub), city=args.city).items():
+            print(f'\n## {title}\n')
+            print(table.to_string())
+
+if __name__ == '__main__':
+    main()
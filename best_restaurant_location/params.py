@@ -0,0 +1,130 @@
+import os
+
+# Menu of the restaurant dropdowns, in display order. The labels of the cuisines are matched against the data
+# when a bundle is compiled, which keeps the entries with restaurants in the city (dataset.config_of)
+dict_rest = {
+    'All':['All'],
+    'European': ['All', 'French', 'Italian', 'Swiss', 'Portuguese', 'Spanish'],
+    'Asian':['All', 'Japanese', 'Chinese', 'Thai', 'Indian', 'Other Asian'],
+    'Middle Eastern & African': ['All', 'Lebanese', 'Turkish', 'Other Middle Eastern', 'African'],
+    'American': ['All', 'American', 'South American', 'Mexican', 'Hawaiian'],
+    'General': ['All', 'Restaurant', 'Bar / Pub / Bistro', 'Café'],
+    'Fast Food':['All', 'Pizza', 'Hamburger', 'Chicken', 'Snacks / Take Away'],
+    'Steakhouse / Barbecue / Grill': ['Steakhouse / Barbecue / Grill'],
+    'Seafood': ['Seafood'],
+    'Vegan / Vegetarian / Salad': ['Vegan / Vegetarian / Salad'],
+    'All Other': ['All Other']}
+
+# Required dictionary for sliders
+dict_slider1 = {'very low':0,
+               'low':1,
+               'neutral':2,
+               'high':3,
+               'very high':4}
+
+dict_slider2 = {'very low':4,
+               'low':3,
+               'neutral':2,
+               'high':1,
+               'very high':0}
+
+# Required dictionary for price levels
+dict_price = {4:'Expensive',
+              3:'Medium',
+              2:'Cheap'}
+
+# Map tabs, in display order
+list_tabs = ["🗺 Overview", "＄ Price Levels", "📊 Review Scores", "📈 Number of Reviews", "🟢🔴 Best/Worst Locations"]
+
+# Bins of the colored maps, applied with np.digitize: a value v falls in bin i when edges[i-1] <= v < edges[i]
+# bins are listed from the lowest to the highest value as (legend label, legend color, marker color)
+# legend_descending lists the highest bin first in the layer control
+dict_bins = {
+    'price': {'column': 'price_level_combined',
+              'layer': 'Price Level',
+              'edges': [3.0, 4.0],
+              'bins': [('Cheap', '#006400', 'green'),
+                       ('Medium', '#FFA500', 'orange'),
+                       ('Expensive', '#FF0000', 'red')],
+              'fill': False,
+              'legend_descending': True},
+    'rating': {'column': 'combined_rating',
+               'layer': 'Review Score',
+               'edges': [4.0, 4.5],
+               'bins': [('Low', '#FF0000', 'red'),
+                        ('Average', '#FFA500', 'orange'),
+                        ('High', '#006400', 'green')],
+               'fill': False,
+               'legend_descending': False},
+    'reviews': {'column': 'user_ratings_total',
+                'layer': '# of Reviews',
+                'edges': [50.0, 150.0, 250.0],
+                'bins': [('Low', '#FF0000', 'red'),
+                         ('Average', '#FFA500', 'orange'),
+                         ('High', '#90EE90', 'lightgreen'),
+                         ('Very High', '#006400', 'green')],
+                'fill': True,
+                'legend_descending': False}}
+
+# Deployment settings, read from the environment
+# BRL_COMPACT_MAPS=0 switches back to one folium object per restaurant in the map html
+compact_maps = os.environ.get('BRL_COMPACT_MAPS', '1') != '0'
+# BRL_MAP_RENDERER=pydeck draws maps 01-04 as a WebGL deck.gl layer instead of folium
+map_renderer = os.environ.get('BRL_MAP_RENDERER', 'folium')
+
+# RGB of the marker colors, for the pydeck renderer
+dict_rgb = {'green': [0, 128, 0],
+            'orange': [255, 165, 0],
+            'red': [255, 0, 0],
+            'lightgreen': [144, 238, 144],
+            'blue': [38, 126, 202]}
+
+# Data files of the default city, the districts file holds the center and zoom of the maps of every district
+# The manifest.json of the directory of the data files names the version the app serves, these names
+# are the files of a city without manifest (see cities.publish)
+path_data = 'data/data_combined_v1.05.csv'
+path_cluster_centers = 'data/data_cluster_centers_v1.02.csv'
+path_district = 'data/data_district.csv'
+
+# Cities of the app, each its own partition of the data. Every directory of BRL_CITIES_DIR holding the
+# three data files (same file names as above) adds a city named after the directory
+default_city = 'Geneva'
+path_cities = os.environ.get('BRL_CITIES_DIR', 'data/cities')
+# A city no session used for BRL_CITY_IDLE seconds is dropped from the shared cache, and loaded again on next use
+city_idle_seconds = int(os.environ.get('BRL_CITY_IDLE', 1800))
+
+# Compiled bundles of the data files (make bundle), the app loads the one named in <path_bundles>/<city>/CURRENT
+# and falls back to the csv files of the city when there is none. BRL_BUNDLE=0 always reads the csv files
+# Processes pointing BRL_BUNDLES to the same directory (e.g. in /dev/shm) share the memory of the data
+path_bundles = os.environ.get('BRL_BUNDLES', 'bundles')
+bundle_enabled = os.environ.get('BRL_BUNDLE', '1') != '0'
+# Restaurants read at once by make bundle, which bounds its memory whatever the size of the data file.
+# BRL_CHUNKSIZE=0 reads the whole file
+bundle_chunksize = int(os.environ.get('BRL_CHUNKSIZE', 100000))
+# Every BRL_RELOAD seconds the watcher checks the manifests and the bundles of the cities, and swaps in
+# the new versions once loaded and warmed up, without restarting the server. BRL_RELOAD=0 turns it off
+reload_seconds = int(os.environ.get('BRL_RELOAD', 60))
+# Backend answering the filter and the scoring aggregates: pandas keeps the restaurants in memory,
+# sqlite queries the database of the current bundle and only loads the rows of a selection
+backend = os.environ.get('BRL_BACKEND', 'pandas')
+
+# Local log of the selections made in the app, one json object per line. BRL_ACCESS_LOG_ENABLED=0 turns it off
+path_access_log = os.environ.get('BRL_ACCESS_LOG', 'logs/access.jsonl')
+access_log_enabled = os.environ.get('BRL_ACCESS_LOG_ENABLED', '1') != '0'
+
+# Background warm-up of the shared cache when the server starts: the 'All' selection, then the
+# BRL_WARMUP_TOP most popular selections of the last BRL_WARMUP_LOG_MB of the access log. BRL_WARMUP=0 turns it off
+warmup_enabled = os.environ.get('BRL_WARMUP', '1') != '0'
+warmup_top = int(os.environ.get('BRL_WARMUP_TOP', 10))
+warmup_log_bytes = int(float(os.environ.get('BRL_WARMUP_LOG_MB', 16)) * 2 ** 20)
+
+# BRL_DEBUG=1 (or the ?debug=1 query parameter) times every stage, logs the timings as json lines
+# and shows them with the cache statistics in a debug expander
+debug_enabled = os.environ.get('BRL_DEBUG', '0') == '1'
+
+# With BRL_PROFILING=1 (make run_profiling, for the deploys investigating a slow rerun) the ?profile=1 query
+# parameter runs the rerun under cProfile, saves the .prof file in BRL_PROFILE_DIR and shows the top functions.
+# Off by default, as any visitor of the app can add the parameter. Only the last BRL_PROFILE_KEEP files are kept
+profiling_enabled = os.environ.get('BRL_PROFILING', '0') == '1'
+path_profiles = os.environ.get('BRL_PROFILE_DIR', 'profiles')
+profiles_kept = int(os.environ.get('BRL_PROFILE_KEEP', 20))
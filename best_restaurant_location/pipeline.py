@@ -0,0 +1,81 @@
+import time
+
+from best_restaurant_location.timing import span
+
+
+class Pipeline:
+    """
+    Runs the stages of a rerun, each stage is only recomputed when its key changes
+    The key of a stage holds every input it depends on, including the keys of upstream stages
+    The last key and result of every stage are kept in state, which survives reruns
+    Shared stages also go through cache, so a result computed by one session serves all the others,
+    and through flights, so sessions asking for the same missing result at once compute it only once
+    Every stage run is recorded in log with its duration and outcome: 'session' (unchanged since the
+    last rerun), 'hit' (shared cache), 'coalesced' (waited on another session) or 'computed'
+    live(key) tells whether the result of a stage key is still of use to other sessions, e.g. False for
+    the keys of a data version swapped out during the rerun, whose results are then kept out of cache
+    """
+    def __init__(self, state, cache=None, flights=None, live=None):
+        self.state = state
+        self.cache = cache
+        self.flights = flights
+        self.live = live
+        self.log = []
+
+    @property
+    def computed(self):
+        return [record['stage'] for record in self.log if record['outcome'] == 'computed']
+
+    @property
+    def coalesced(self):
+        return [record['stage'] for record in self.log if record['outcome'] == 'coalesced']
+
+    def stage(self, name, key, compute, shared=True):
+        """
+        Returns the result of the stage for key, calling compute only if key changed since the last run
+        and, for shared stages, no other session computed it yet
+        """
+        with span(f'stage {name}') as record:
+            value, outcome, seconds = self.run_stage(name, key, compute, shared)
+            record['outcome'] = outcome
+        self.log.append({'stage': name, 'outcome': outcome, 'seconds': seconds})
+        return value
+
+    def run_stage(self, name, key, compute, shared):
+        start = time.perf_counter()
+        last = self.state.get(name)
+        if last is not None and last[0] == key:
+            return last[1], 'session', time.perf_counter() - start
+
+        use_cache = shared and self.cache is not None
+        value = self.cache.get((name, key)) if use_cache else None
+        outcome = 'hit'
+        if value is None:
+            if use_cache and self.flights is not None:
+                def compute_shared():
+                    # another session may have stored the result between the lookup above and this flight
+                    cached = self.cache.peek((name, key))
+                    if cached is not None:
+                        return cached, 'hit'
+                    return self.share(name, key, compute()), 'computed'
+
+                (value, outcome), leader = self.flights.do((name, key), compute_shared)
+                if not leader:
+                    outcome = 'coalesced'
+            else:
+                value, outcome = compute(), 'computed'
+                if use_cache:
+                    self.share(name, key, value)
+
+        self.state[name] = (key, value)
+        return value, outcome, time.perf_counter() - start
+
+    def share(self, name, key, value):
+        """
+        Stores the result of a stage in cache for the other sessions, returns it
+        """
+        self.cache.put((name, key), value)
+        # checked after the put: a swap after the check drops the entry with the others of its data
+        if self.live is not None and not self.live(key):
+            self.cache.drop(lambda entry: entry == (name, key))
+        return value
@@ -0,0 +1,77 @@
+import cProfile
+import os
+import pstats
+import re
+import threading
+import time
+
+import pandas as pd
+
+# Held by the running profiler: since python 3.12 cProfile profiles every thread of the process
+# (through sys.monitoring) and only one profiler can be enabled at a time
+lock = threading.Lock()
+
+
+def start():
+    """
+    Starts profiling the process and returns the profiler, or None when another profiler is running
+    The profile includes the other threads running meanwhile, e.g. other sessions, warm-up and watcher
+    """
+    if not lock.acquire(blocking=False):
+        return None
+    try:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    except BaseException:
+        lock.release()
+        raise
+    return profiler
+
+def release(profiler):
+    """
+    Stops the profiler if it still runs and lets the next rerun start one, does nothing for None
+    """
+    if profiler is None:
+        return
+    profiler.disable()
+    lock.release()
+
+def stop(profiler, directory, label, keep):
+    """
+    Stops the profiler and saves its stats as a .prof file of directory, named after label
+    Only the keep most recent .prof files of directory are kept
+    Returns the path of the file, the profiler still has to be released
+    """
+    profiler.disable()
+    os.makedirs(directory, exist_ok=True)
+    name = re.sub(r'[^A-Za-z0-9_-]+', '-', label).strip('-')
+    path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}_{os.getpid()}_{name}.prof")
+    profiler.dump_stats(path)
+    prune_profiles(directory, keep)
+    return path
+
+def prune_profiles(directory, keep):
+    """
+    Removes the .prof files of directory but the keep most recent ones
+    """
+    paths = sorted((os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.prof')),
+                   key=os.path.getmtime, reverse=True)
+    for path in paths[keep:]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # removed by another process of the app meanwhile
+            pass
+
+def top_functions(path, n=30):
+    """
+    Returns the n functions of a .prof file with the highest cumulative time
+    """
+    stats = pstats.Stats(path).stats
+    rows = [{'function': function,
+             'location': f'{os.path.basename(filename)}:{line}',
+             'calls': calls,
+             'tottime_ms': round(tottime * 1000, 3),
+             'cumtime_ms': round(cumtime * 1000, 3)}
+            for (filename, line, function), (primitive_calls, calls, tottime, cumtime, callers) in stats.items()]
+    return pd.DataFrame(rows).sort_values('cumtime_ms', ascending=False).head(n).reset_index(drop=True)
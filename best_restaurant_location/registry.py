@@ -0,0 +1,79 @@
+"""
+Registry of the data versions the app serves: the source of every city, its current bundle or the csv files
+named by its manifest. A rerun reads the source of its city once, when it loads its dataset, and the stages
+key their results by the data they read. The watcher swaps in a new source with one assignment, so a rerun
+sees the old version or the new one, never a mix of both
+The process holds the bundle of every current source, so that no other process prunes it
+"""
+import threading
+
+from best_restaurant_location.cities import city_bundles
+from best_restaurant_location.dataset import current_bundle, hold_bundle, source_stats
+from best_restaurant_location.params import backend, bundle_enabled
+
+
+def csv_source(city, paths):
+    """
+    Returns the source of the csv files of a city, its key changes whenever one of the files does
+    """
+    stats = source_stats(paths)
+    return {'city': city,
+            'key': tuple(paths) + tuple(stat['mtime'] for stat in stats.values()),
+            'paths': list(paths),
+            'bundle': None}
+
+def bundle_source(city, paths, bundle):
+    """
+    Returns the source of a compiled bundle of a city, keyed by its directory, which names its version
+    """
+    return {'city': city, 'key': bundle, 'paths': list(paths), 'bundle': bundle}
+
+def city_source(city, paths):
+    """
+    Returns the source of a city when the app starts: its current bundle, or its csv files when it has
+    none or bundles are off. The sqlite backend needs the bundle, whose database it queries
+    """
+    bundle = current_bundle(city_bundles(city)) if bundle_enabled or backend == 'sqlite' else None
+    return csv_source(city, paths) if bundle is None else bundle_source(city, paths, bundle)
+
+class Registry:
+    """
+    The current source of every city, shared by all sessions of the process
+    """
+    def __init__(self, dict_paths):
+        # lock files of the bundles of the current sources, by bundle
+        self.holds = {}
+        # keys of the sources swapped out, no result of their data is cached anymore
+        self.retired = set()
+        self.sources = {city: self.hold(city_source(city, paths)) for city, paths in dict_paths.items()}
+        self.lock = threading.Lock()
+        self.swaps = 0
+
+    def hold(self, source):
+        if source['bundle'] is not None:
+            self.holds[source['bundle']] = hold_bundle(source['bundle'])
+        return source
+
+    def current(self, city):
+        return self.sources[city]
+
+    def is_retired(self, key):
+        return key in self.retired
+
+    def swap(self, city, source):
+        """
+        Makes source the current source of a city, returns the source it replaces
+        The bundle of the old source is released, sessions still showing its results keep their memory maps
+        """
+        self.hold(source)
+        with self.lock:
+            old, self.sources[city] = self.sources[city], source
+            self.retired.add(old['key'])
+            # the data of a city may go back to an earlier version
+            self.retired.discard(source['key'])
+            self.swaps += 1
+        if old['bundle'] is not None and old['bundle'] != source['bundle']:
+            lock = self.holds.pop(old['bundle'], None)
+            if lock is not None:
+                lock.close()
+        return old
@@ -0,0 +1,162 @@
+import os
+
+import pandas as pd
+
+from best_restaurant_location.maps import restaurant_popup_html
+from best_restaurant_location.timing import span
+
+# Columns of the restaurants read by the app and their types, the wider data files
+# (e.g. data_combined_v1.04.csv and its demographics) are projected on them
+data_columns = {'place_id': 'str',
+                'name': 'str',
+                'price_level_combined': 'float64',
+                'user_ratings_total': 'float64',
+                'combined_rating': 'float64',
+                'geometry.location.lat': 'float64',
+                'geometry.location.lng': 'float64',
+                'combined_main_category': 'str',
+                'sub_category': 'str',
+                'district': 'str',
+                'district_cluster': 'int64',
+                'combined_main_category_2': 'str'}
+
+
+def read_csv(path, **kwargs):
+    with span('read_csv') as record:
+        df = pd.read_csv(path, **kwargs)
+        record['rows'] = len(df)
+        record['bytes'] = os.path.getsize(path)
+    return df
+
+
+def load_data(path_data, path_cluster_centers, path_district):
+    """
+    Loads the restaurants, the district cluster centers and the district centers
+    The popup html of every restaurant is computed once here
+    """
+    # main dataframe, only the columns the app reads
+    data = read_csv(path_data, usecols=list(data_columns), dtype=data_columns)[list(data_columns)]
+    with span('popup_html', rows=len(data)):
+        data['popup_html'] = restaurant_popup_html(data)
+
+    # Dataframe contains coordinates for district and district clusters
+    df_cluster_centers = read_csv(path_cluster_centers)
+    df_district = read_csv(path_district)
+
+    return data, df_cluster_centers, df_district
+
+def filter_data(data, rest_district, rest_category_main, rest_category):
+    """
+    Filters main dataframe based on district or restaurant selection
+    FOR DROWDOWN MENUS
+    Returns a filtered dataframe
+    """
+    with span('filter_data', rows=len(data)):
+        if rest_district != 'All':
+            data = data[data['district']==rest_district]
+
+        if rest_category_main != 'All':
+            data = data[data['combined_main_category_2']==rest_category_main]
+
+        if rest_category != 'All':
+            data = data[data['combined_main_category'].str.contains(rest_category)]
+
+        return data.reset_index(drop=True)
+
+def filter_data_scoring(data, rest_district, rest_category_main, rest_category):
+    """
+    Filters main dataframe based on district or restaurant selection
+    FOR SCORING
+    Returns a filtered dataframe
+    """
+    if rest_district != 'All':
+        data = data[data['district']==rest_district]
+
+    if rest_category_main != 'All':
+        data = data[data['combined_main_category_2']==rest_category_main]
+
+    if rest_category != 'All':
+        data = data[data['combined_main_category'].str.contains(rest_category)]
+
+    data = data.groupby(['district','district_cluster'], observed=True)\
+        [['place_id', 'user_ratings_total','combined_rating']]\
+        .agg({'place_id':'count',
+        'user_ratings_total':'mean',
+        'combined_rating':'mean'})\
+        .rename(columns={'place_id':f'{rest_category.lower()}_restaurants'})
+
+    return data.reset_index()
+
+def merge_data(data, rest_district, rest_category_main, rest_category, aggregate=filter_data_scoring):
+    """
+    Creates a merged data set based on filtering selections and
+    returns the final data set before normalization and scoring
+    aggregate computes the per cluster counts and means of a selection, filter_data_scoring or
+    a faster equivalent such as Dataset.aggregate, data may be None when aggregate does not read it
+    """
+    if rest_category == 'All':
+        data = aggregate(data, rest_district, rest_category_main, rest_category)
+    else:
+        data = aggregate(data, rest_district, 'All', 'All')\
+            .merge(
+                aggregate(data, rest_district, rest_category_main, rest_category)\
+                    .drop(columns=['district','user_ratings_total','combined_rating']),
+                how='left',
+                on='district_cluster')\
+            .fillna(0)
+    return data
+
+def score_data(data, rest_district, rest_category_main, rest_category, score_com, score_pop, score_sat, df_cluster_centers,
+               aggregate=filter_data_scoring):
+    """
+    Normalizes merged data set and create a custom scoring
+    """
+    # create merged data set
+    with span('merge_data', rows=None if data is None else len(data)):
+        df_merged = merge_data(data, rest_district, rest_category_main, rest_category, aggregate)
+
+    # min-max normalization, a constant column is normalized to 0 (like sklearn's MinMaxScaler)
+    cols = df_merged.drop(columns=['district','district_cluster'])
+    cols_min = cols.min()
+    cols_range = cols.max() - cols_min
+    df_score = ((cols - cols_min) / cols_range.where(cols_range != 0, 1)).add_suffix('_norm')
+
+    # scoring
+    if rest_category == 'All':
+        score_tot = score_com + score_pop + score_sat
+        df_score['score'] = (score_com * (1-df_score['all_restaurants_norm'])\
+                            +score_pop * df_score['user_ratings_total_norm']\
+                            +score_sat * (1-df_score['combined_rating_norm']))\
+                            / score_tot
+
+
+    else:
+        score_tot = 2 * score_com + score_pop + score_sat
+        df_score['score'] = (score_com * (1-df_score['all_restaurants_norm'])\
+                            +score_pop * df_score['user_ratings_total_norm']\
+                            +score_sat * (1-df_score['combined_rating_norm'])
+                            +score_com * (1-df_score[f'{rest_category.lower()}_restaurants_norm']))\
+                            / score_tot
+
+    # create output data_set
+    df_output = pd.concat([df_merged, df_score], axis=1)\
+        .merge(df_cluster_centers, how='left', on='district_cluster')
+    return df_output
+
+def pick_location(data, rest_district, rest_category_main, rest_category, score_com, score_pop, score_sat, df_cluster_centers,
+                  aggregate=filter_data_scoring):
+    """
+    Select best / worst location based on custom scoring
+    """
+    if rest_district == 'All':
+        n = 5
+    else:
+        n = 1
+
+    with span('score_data', rows=None if data is None else len(data)):
+        df_score = score_data(data, rest_district, rest_category_main, rest_category, score_com, score_pop, score_sat,
+                              df_cluster_centers, aggregate)
+    best_location = df_score.nlargest(n, 'score').reset_index(drop=True)
+    worst_location = df_score.nsmallest(n, 'score').reset_index(drop=True)
+
+    return best_location, worst_location
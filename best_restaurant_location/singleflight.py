@@ -0,0 +1,64 @@
+import threading
+
+
+class Call:
+    """
+    A computation in flight, the callers waiting on it read its value or error once done is set
+    """
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical computations: the first caller of a key computes it,
+    callers arriving with the same key meanwhile wait for that result instead of computing their own
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.coalesced = 0
+
+    def do(self, key, compute):
+        """
+        Returns compute() for key, shared with every concurrent caller of the same key
+        Returns a (value, leader) tuple, leader is True for the caller that actually computed
+        An error of compute is raised to every waiting caller. A leader stopped by anything else
+        (KeyboardInterrupt, the control exceptions streamlit raises to stop or rerun a script) did not
+        get a result, the waiting callers then start a new flight instead
+        """
+        while True:
+            with self.lock:
+                call = self.calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self.calls[key] = Call()
+                else:
+                    self.coalesced += 1
+
+            if leader:
+                break
+            call.done.wait()
+            if isinstance(call.error, Exception):
+                raise call.error
+            if call.error is None:
+                return call.value, False
+
+        try:
+            call.value = compute()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.value, True
+
+    def stats(self):
+        with self.lock:
+            return {'in_flight': len(self.calls), 'coalesced': self.coalesced}
+
+# Computations of the shared stages, for all sessions of the process
+flights = SingleFlight()
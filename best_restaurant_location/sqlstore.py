@@ -0,0 +1,251 @@
+"""
+SQLite backend of the restaurants: the filter and the scoring aggregates run as indexed queries on a
+database compiled next to the bundle, so the restaurants stay on disk instead of in memory
+Usage: python -m best_restaurant_location.sqlstore [--city Geneva] [--district All --main All --sub All] [--rounds 20]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from best_restaurant_location.dataset import config_codes, load_bundle_parts
+from best_restaurant_location.timing import span
+
+# File of the database in a bundle directory
+sqlite_name = 'restaurants.sqlite'
+
+# Lookup tables of the restaurants: table, column of the restaurants it codes, code column
+lookup_tables = [('district', 'district', 'district_code'),
+                 ('main_category', 'combined_main_category_2', 'main_code'),
+                 ('cuisine_label', 'combined_main_category', 'cuisine_code')]
+
+schema = """
+CREATE TABLE district (code INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE main_category (code INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE cuisine_label (code INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE district_cluster (
+    district_cluster INTEGER PRIMARY KEY,
+    cluster_center_lat REAL NOT NULL,
+    cluster_center_lng REAL NOT NULL);
+CREATE TABLE restaurant (
+    row INTEGER PRIMARY KEY,
+    place_id TEXT NOT NULL,
+    name TEXT,
+    price_level_combined REAL,
+    user_ratings_total REAL,
+    combined_rating REAL,
+    lat REAL NOT NULL,
+    lng REAL NOT NULL,
+    cuisine_code INTEGER REFERENCES cuisine_label (code),
+    sub_category TEXT,
+    district_code INTEGER REFERENCES district (code),
+    district_cluster INTEGER REFERENCES district_cluster (district_cluster),
+    main_code INTEGER REFERENCES main_category (code),
+    popup_html TEXT);
+CREATE INDEX restaurant_district ON restaurant (district_code, main_code);
+CREATE INDEX restaurant_main ON restaurant (main_code);
+CREATE INDEX restaurant_cuisine ON restaurant (cuisine_code);
+-- covers the scoring aggregates, which read it in group order instead of the restaurants
+CREATE INDEX restaurant_scoring ON restaurant (district_code, district_cluster, main_code, cuisine_code,
+                                               user_ratings_total, combined_rating);
+"""
+
+# Columns of the restaurants frame as selected from the tables, in the order of the csv file
+select_columns = """
+    r.place_id AS place_id, r.name AS name, r.price_level_combined AS price_level_combined,
+    r.user_ratings_total AS user_ratings_total, r.combined_rating AS combined_rating,
+    r.lat AS "geometry.location.lat", r.lng AS "geometry.location.lng",
+    c.name AS combined_main_category, r.sub_category AS sub_category, d.name AS district,
+    r.district_cluster AS district_cluster, m.name AS combined_main_category_2, r.popup_html AS popup_html
+"""
+
+joins = """
+    FROM restaurant r
+    LEFT JOIN district d ON d.code = r.district_code
+    LEFT JOIN main_category m ON m.code = r.main_code
+    LEFT JOIN cuisine_label c ON c.code = r.cuisine_code
+"""
+
+# Types of the selected columns that may be NULL, which would be objects of None when all their values are NULL
+select_dtypes = {'name': 'str', 'sub_category': 'str',
+                 'price_level_combined': 'float64', 'user_ratings_total': 'float64', 'combined_rating': 'float64',
+                 'geometry.location.lat': 'float64', 'geometry.location.lng': 'float64',
+                 'district_cluster': 'int64'}
+
+
+class SQLiteDataset:
+    """
+    Same interface as dataset.Dataset for the stages, with the restaurants in a SQLite database:
+    filter() and aggregate() are queries, and data is None since the restaurants are never loaded whole
+    The cluster centers, districts, hulls and config are small and come from the bundle
+    Every thread opens its own read-only connection, sqlite3 connections are not shared between threads
+    """
+    def __init__(self, path, cluster_centers, districts, hulls, config, version):
+        self.path = path
+        self.data = None
+        self.cluster_centers = cluster_centers
+        self.districts = districts
+        self.hulls = hulls
+        self.config = config
+        self.lookup = config_codes(config)
+        self.version = version
+        self.local = threading.local()
+        with self.connection() as con:
+            self.categories = {table: pd.Index(pd.read_sql_query(f'SELECT name FROM {table} ORDER BY code',
+                                                                 con)['name'])
+                               for table, column, code in lookup_tables}
+
+    def connection(self):
+        con = getattr(self.local, 'con', None)
+        if con is None:
+            con = self.local.con = sqlite3.connect(f'file:{os.path.abspath(self.path)}?mode=ro', uri=True)
+        return con
+
+    def where(self, rest_district, rest_category_main, rest_category):
+        """
+        Returns the WHERE clause of a selection and its parameters, matching the filters of scoring.filter_data
+        The cuisine filter is a regular expression searched in the labels: it is evaluated with str.contains
+        over the distinct labels, and the restaurants are selected by the codes of the matching ones
+        The codes of the values of the menu are looked up in the config, the lookup tables keep the codes of the bundle
+        """
+        clauses, parameters = [], []
+        values = [rest_district, rest_category_main, rest_category]
+        for (table, column, code), value in zip(lookup_tables, values):
+            if value == 'All':
+                continue
+            codes = self.lookup[column].get(value)
+            if codes is None:
+                categories = self.categories[table]
+                codes = np.flatnonzero(categories.str.contains(value) if table == 'cuisine_label'
+                                       else categories == value)
+            clauses.append(f'r.{code} IN ({", ".join("?" * len(codes))})' if len(codes) else '0')
+            parameters.extend(int(c) for c in codes)
+        return (f'WHERE {" AND ".join(clauses)}' if clauses else ''), parameters
+
+    def filter(self, rest_district, rest_category_main, rest_category):
+        """
+        Same rows as scoring.filter_data, in the same order
+        """
+        with span('filter_data') as record:
+            where, parameters = self.where(rest_district, rest_category_main, rest_category)
+            df = pd.read_sql_query(f'SELECT {select_columns} {joins} {where} ORDER BY r.row',
+                                   self.connection(), params=parameters, dtype=select_dtypes)
+            record['rows'] = len(df)
+            return df
+
+    def aggregate(self, data, rest_district, rest_category_main, rest_category):
+        """
+        Same frame as scoring.filter_data_scoring, grouped and averaged by SQLite, data is not read
+        """
+        where, parameters = self.where(rest_district, rest_category_main, rest_category)
+        # grouped by code, the district codes follow the sorted district names
+        df = pd.read_sql_query(f"""
+            SELECT r.district_code AS district, r.district_cluster AS district_cluster,
+                   COUNT(*) AS restaurants,
+                   AVG(r.user_ratings_total) AS user_ratings_total, AVG(r.combined_rating) AS combined_rating
+            FROM restaurant r {where}
+            GROUP BY r.district_code, r.district_cluster
+            HAVING r.district_code IS NOT NULL
+            ORDER BY r.district_code, r.district_cluster""", self.connection(), params=parameters,
+            dtype={'district': 'int64', 'district_cluster': 'int64', 'restaurants': 'int64',
+                   'user_ratings_total': 'float64', 'combined_rating': 'float64'})
+        df['district'] = self.categories['district'].take(df['district'])
+        return df.rename(columns={'restaurants': f'{rest_category.lower()}_restaurants'})
+
+def write_sqlite(dataset, path, block=100000):
+    """
+    Writes the restaurants of a dataset.Dataset as a SQLite database at path, block rows at a time
+    The category columns of the filter become lookup tables, the restaurants keep their codes
+    """
+    data = dataset.data
+    con = sqlite3.connect(path)
+    try:
+        with con:
+            con.executescript(schema)
+            for table, column, code in lookup_tables:
+                con.executemany(f'INSERT INTO {table} VALUES (?, ?)',
+                                enumerate(data[column].cat.categories.tolist()))
+            con.executemany('INSERT INTO district_cluster VALUES (?, ?, ?)',
+                            dataset.cluster_centers[['district_cluster', 'cluster_center_lat',
+                                                     'cluster_center_lng']].itertuples(index=False))
+
+            for start in range(0, len(data), block):
+                rows = data.iloc[start:start + block]
+                restaurants = pd.DataFrame({
+                    'row': np.arange(start, start + len(rows)),
+                    'place_id': rows['place_id'].to_numpy(),
+                    'name': rows['name'].to_numpy(),
+                    'price_level_combined': rows['price_level_combined'].to_numpy(),
+                    'user_ratings_total': rows['user_ratings_total'].to_numpy(),
+                    'combined_rating': rows['combined_rating'].to_numpy(),
+                    'lat': rows['geometry.location.lat'].to_numpy(),
+                    'lng': rows['geometry.location.lng'].to_numpy(),
+                    'cuisine_code': rows['combined_main_category'].array.codes,
+                    'sub_category': rows['sub_category'].astype(object).to_numpy(),
+                    'district_code': rows['district'].array.codes,
+                    'district_cluster': rows['district_cluster'].to_numpy(),
+                    'main_code': rows['combined_main_category_2'].array.codes,
+                    'popup_html': rows['popup_html'].to_numpy()})
+                # rows without a category have code -1, stored as NULL
+                for table, column, code in lookup_tables:
+                    restaurants[code] = restaurants[code].astype('Int64').mask(restaurants[code] < 0)
+                restaurants.to_sql('restaurant', con, if_exists='append', index=False)
+        con.execute('ANALYZE')
+    finally:
+        con.close()
+
+def load_sqlite(directory):
+    """
+    Opens the database of the bundle in directory, with the small frames of the bundle memory-mapped
+    """
+    manifest, frames, hulls, config = load_bundle_parts(directory, ['cluster_centers', 'districts'])
+    return SQLiteDataset(os.path.join(directory, sqlite_name), frames['cluster_centers'], frames['districts'],
+                         hulls, config, manifest['version'])
+
+def main():
+    parser = argparse.ArgumentParser(description='Times the filter and the scoring aggregates of the current bundle '
+                                                 'with the SQLite backend and with the pandas one')
+    parser.add_argument('--city', default=None, help='city of the bundle, the default city if omitted')
+    parser.add_argument('--district', default='All')
+    parser.add_argument('--main', default='All')
+    parser.add_argument('--sub', default='All')
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    from best_restaurant_location.cities import city_bundles
+    from best_restaurant_location.dataset import current_bundle, load_bundle
+    from best_restaurant_location.params import default_city
+    from best_restaurant_location.scoring import filter_data, filter_data_scoring
+
+    bundles = city_bundles(args.city or default_city)
+    directory = current_bundle(bundles)
+    if directory is None:
+        parser.error(f'no bundle in {bundles}, run make bundle')
+    dataset, store = load_bundle(directory), load_sqlite(directory)
+    data = dataset.data
+    selection = (args.district, args.main, args.sub)
+
+    cases = {'pandas filter_data': lambda: filter_data(data, *selection),
+             'bundle filter': lambda: dataset.filter(*selection),
+             'sqlite filter': lambda: store.filter(*selection),
+             'pandas filter_data_scoring': lambda: filter_data_scoring(data, *selection),
+             'bundle aggregate': lambda: dataset.aggregate(data, *selection),
+             'sqlite aggregate': lambda: store.aggregate(None, *selection)}
+    rows = []
+    for name, function in cases.items():
+        function()
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            result = function()
+        rows.append({'case': name, 'rows': len(result),
+                     'ms': round((time.perf_counter() - start) * 1000 / args.rounds, 2)})
+    print(f'{json.dumps(selection, ensure_ascii=False)} on {directory}, {len(data)} restaurants')
+    print(pd.DataFrame(rows).to_string(index=False))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+from best_restaurant_location.maps import build_overview_map, build_price_map, build_rating_map, \
+    build_reviews_map, build_location_map, render_map
+from best_restaurant_location.cities import city_bundles, city_paths
+from best_restaurant_location.dataset import build_from_csv, load_bundle
+from best_restaurant_location.params import compact_maps, backend, city_idle_seconds
+from best_restaurant_location.registry import Registry
+from best_restaurant_location.scoring import pick_location
+from best_restaurant_location.sqlstore import load_sqlite
+from best_restaurant_location.timing import span
+
+# Builders of the restaurant maps 01-04, by map name
+dict_map_builders = {'overview': build_overview_map,
+                     'price': build_price_map,
+                     'rating': build_rating_map,
+                     'reviews': build_reviews_map}
+
+# The stages of the app, shared by the streamlit script and the background warm-up so that
+# both compute the same stage keys
+# Data files of every city, and the version of its data served by the process, from its current compiled
+# bundle or from its csv files when there is none. The watcher swaps in the new versions
+dict_cities = city_paths()
+registry = Registry(dict_cities)
+
+def data_key(city):
+    """
+    Returns the key of the current data of a city
+    """
+    return registry.current(city)['key']
+
+def live(key):
+    """
+    Returns whether a stage key was computed from data the process still serves, see drop_data
+    """
+    return not (registry.is_retired(key) or (isinstance(key, tuple) and key and registry.is_retired(key[0])))
+
+def load_source(source):
+    """
+    Loads the Dataset of a source of the registry, or its SQLiteDataset with the sqlite backend
+    The dataset keeps the key of its source, which starts the keys of every stage computed from it
+    """
+    if backend == 'sqlite':
+        if source['bundle'] is None:
+            raise FileNotFoundError(f'BRL_BACKEND=sqlite queries the current bundle, none in '
+                                    f'{city_bundles(source["city"])}: run make bundle')
+        with span('load_sqlite'):
+            dataset = load_sqlite(source['bundle'])
+    elif backend != 'pandas':
+        raise ValueError(f'unknown BRL_BACKEND {backend}, expected pandas or sqlite')
+    elif source['bundle'] is not None:
+        with span('load_bundle'):
+            dataset = load_bundle(source['bundle'])
+    else:
+        dataset = build_from_csv(*source['paths'])
+    dataset.key = source['key']
+    return dataset
+
+def drop_data(cache, keys):
+    """
+    Removes the data of the data keys from cache, with every result computed from it
+    Returns the number of entries removed
+    """
+    return cache.drop(lambda entry: entry[1] in keys or
+                      (isinstance(entry[1], tuple) and entry[1] and entry[1][0] in keys))
+
+def load_stage(pipeline, city):
+    """
+    Returns the Dataset of the current version of a city, or its SQLiteDataset with the sqlite backend,
+    loaded on first use
+    The cities no session used for city_idle_seconds are evicted from the shared cache with all the
+    entries of their data, sessions still showing one keep it until they select another city or end
+    """
+    source = registry.current(city)
+    if pipeline.cache is not None:
+        pipeline.cache.touch(('load', source['key']))
+        idle = {data for stage, data in pipeline.cache.evict_idle('load', city_idle_seconds)}
+        if idle:
+            drop_data(pipeline.cache, idle)
+    return pipeline.stage('load', source['key'], lambda: load_source(source))
+
+def filter_stage(pipeline, dataset, selection):
+    """
+    Returns the restaurants of selection, a (district, main category, sub category) tuple of a city
+    The stages are keyed by the data of the dataset loaded by the rerun, not by the current data of the city,
+    which may change meanwhile
+    """
+    return pipeline.stage('filter', (dataset.key, selection), lambda: dataset.filter(*selection))
+
+def scoring_stage(pipeline, dataset, selection, weights):
+    """
+    Returns the best and worst locations of selection, weights is a (competitors, popularity, satisfaction) tuple
+    """
+    return pipeline.stage('scoring', (dataset.key, selection, weights),
+                          lambda: pick_location(dataset.data, *selection, *weights, dataset.cluster_centers,
+                                                dataset.aggregate))
+
+def map_view(df_district, rest_district):
+    """
+    Returns the center and zoom of the maps of a district, from the zoom table of the districts
+    """
+    lat = df_district[df_district['district']==rest_district]['district_lat'].iloc[0]
+    lng = df_district[df_district['district']==rest_district]['district_lng'].iloc[0]
+    zoom = df_district[df_district['district']==rest_district]['zoom'].iloc[0]
+    return [lat, lng], zoom
+
+def map_key(dataset, selection, *key):
+    return (dataset.key, selection, *key)
+
+def restaurant_map_stage(pipeline, dataset, name, df, selection, location, zoom):
+    """
+    Returns the html of one of the restaurant maps 01-04
+    """
+    def build():
+        with span(f'build_map_{name}', rows=len(df)):
+            map_object = dict_map_builders[name](df, location, zoom, compact_maps)
+        return render_map(map_object)
+
+    return pipeline.stage(f'map_{name}', map_key(dataset, selection), build)
+
+def location_map_stage(pipeline, dataset, selection, weights, location, zoom):
+    """
+    Returns the html of the best / worst location map 05, scoring the selection only if the map is not cached
+    """
+    def build():
+        best_locations, worst_locations = scoring_stage(pipeline, dataset, selection, weights)
+        with span('build_map_location', rows=len(best_locations) + len(worst_locations)):
+            map_object = build_location_map(dataset.data, best_locations, worst_locations, selection[2],
+                                            location, zoom, compact_maps, dataset.hulls)
+        return render_map(map_object)
+
+    return pipeline.stage('map_location', map_key(dataset, selection, weights), build)
@@ -0,0 +1,168 @@
+"""
+Generates synthetic cities with the schema of the Geneva data, to benchmark the app on more restaurants
+Usage: python -m best_restaurant_location.synthetic data/synthetic --restaurants 100000 [--districts 10 --clusters 36]
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from best_restaurant_location.params import path_data, path_cluster_centers, path_district
+
+# Cuisine mix of the generated restaurants, the most frequent (combined_main_category_2,
+# combined_main_category, sub_category) combinations of the Geneva data with their counts there
+list_cuisines = [
+    ('General', 'General / Restaurant', None, 298),
+    ('General', 'General / Bar / Pub / Bistro', None, 89),
+    ('Fast Food', 'General / Fast food / Snacks / Take Away', 'Sandwich / Snacks', 78),
+    ('European', 'Italian', None, 73),
+    ('European', 'French', None, 63),
+    ('General', 'General / Café', None, 60),
+    ('Asian', 'Japanese', 'Sushi', 52),
+    ('Asian', 'Thai', None, 48),
+    ('Asian', 'Chinese', None, 37),
+    ('European', 'French, European', None, 35),
+    ('Hamburger, American', 'Hamburger, American', None, 35),
+    ('Middle Eastern & African', 'Lebanese', None, 35),
+    ('Fast Food', 'Pizza', None, 33),
+    ('Middle Eastern & African', 'Turkish', None, 31),
+    ('Asian', 'Indian', None, 30),
+    ('European', 'French, Swiss, European', None, 24),
+    ('Fast Food', 'General / Fast food / Snacks / Take Away', 'Take Away', 23),
+    ('Fast Food', 'Italian, Pizza', None, 22),
+    ('European', 'Swiss, European', None, 21),
+    ('European', 'European', None, 19),
+    ('Vegan / Vegetarian / Salad', 'Vegan / Vegetarian / Salad', None, 17),
+    ('European', 'Portuguese', None, 15),
+    ('Fast Food', 'Chicken', None, 15),
+    ('American', 'Hawaiian', None, 14),
+    ('American', 'South American', 'Peruvian', 13),
+    ('American', 'Mexican', 'Taco', 12),
+    ('Middle Eastern & African', 'Other Middle Eastern', None, 11),
+    ('Seafood', 'Seafood', None, 11),
+    ('Steakhouse / Barbecue / Grill', 'Steakhouse / Barbecue / Grill', None, 9),
+    ('Asian', 'Other Asian', 'Vietnamese', 8),
+    ('European', 'Swiss', None, 8),
+    ('Middle Eastern & African', 'African', 'Ethiopian', 8),
+    ('All Other', 'All Other', 'Moroccan', 7),
+    ('European', 'Spanish', 'Tapas', 6),
+    ('American', 'American', None, 3),
+    ('American, European', 'American, European', None, 3)]
+
+# Share of the restaurants without price level, and without reviews and rating, in the Geneva data
+share_no_price = 0.124
+share_no_reviews = 0.125
+
+# Base64 alphabet of the Google place ids
+place_id_alphabet = np.array(list('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_'))
+
+
+def place_ids(rng, n):
+    """
+    Returns n random ids shaped like Google place ids (27 characters starting with ChIJ)
+    """
+    suffixes = place_id_alphabet[rng.integers(0, len(place_id_alphabet), (n, 23))]
+    return 'ChIJ' + pd.Series(suffixes.view('<U23').ravel())
+
+def generate_city(n_restaurants, n_districts=10, n_clusters=36, seed=0, center=(46.20496, 6.14299)):
+    """
+    Generates a city of n_restaurants restaurants in n_districts districts, split in n_clusters
+    district clusters numbered from 1
+    Districts lie around center, clusters around their district center and restaurants around their
+    cluster center, some clusters being much busier than others. Every district has its own cuisine mix
+    drawn around the Geneva one
+    Returns data, df_cluster_centers and df_district with the columns of the files of data/
+    """
+    if n_clusters < n_districts:
+        raise ValueError(f'n_clusters ({n_clusters}) must be at least n_districts ({n_districts})')
+    rng = np.random.default_rng(seed)
+
+    # districts ~1 km apart, covering a disc that grows with their number
+    radius = 0.006 * np.sqrt(n_districts)
+    angle = rng.uniform(0, 2 * np.pi, n_districts)
+    distance = radius * np.sqrt(rng.uniform(0, 1, n_districts))
+    district_lat = center[0] + distance * np.sin(angle)
+    district_lng = center[1] + distance * np.cos(angle) / np.cos(np.radians(center[0]))
+    districts = np.array([f'District {i:0{len(str(n_districts))}d}' for i in range(1, n_districts + 1)])
+
+    # every district gets at least one cluster, the others are spread at random
+    cluster_district = np.concatenate([np.arange(n_districts),
+                                       rng.integers(0, n_districts, n_clusters - n_districts)])
+    cluster_district.sort()
+    cluster_lat = district_lat[cluster_district] + rng.normal(0, 0.003, n_clusters)
+    cluster_lng = district_lng[cluster_district] + rng.normal(0, 0.004, n_clusters)
+
+    # restaurants, clusters busier than others
+    weights = rng.lognormal(0, 0.8, n_clusters)
+    cluster = rng.choice(n_clusters, n_restaurants, p=weights / weights.sum())
+    district = cluster_district[cluster]
+
+    # cuisines, drawn from the mix of the district of the restaurant
+    counts = np.array([cuisine[3] for cuisine in list_cuisines], dtype=float)
+    district_mix = rng.dirichlet(50 * counts / counts.sum(), n_districts).cumsum(axis=1)
+    cuisine = (district_mix[district] < rng.uniform(0, 1, (n_restaurants, 1))).sum(axis=1)
+    cuisine = np.minimum(cuisine, len(list_cuisines) - 1)
+    main_category_2, main_category, sub_category = (np.array([c[i] for c in list_cuisines], dtype=object)[cuisine]
+                                                    for i in range(3))
+
+    price = rng.choice([2.0, 3.0, 4.0], n_restaurants, p=[0.11, 0.48, 0.41])
+    price[rng.uniform(0, 1, n_restaurants) < share_no_price] = np.nan
+    reviews = np.maximum(1, np.round(rng.lognormal(4.4, 1.4, n_restaurants)))
+    rating = np.clip(np.round(rng.normal(4.3, 0.45, n_restaurants), 1), 1, 5)
+    no_reviews = rng.uniform(0, 1, n_restaurants) < share_no_reviews
+    reviews[no_reviews] = np.nan
+    rating[no_reviews] = np.nan
+
+    ids = place_ids(rng, n_restaurants)
+    data = pd.DataFrame({'place_id': ids,
+                         'name': pd.Series(main_category).str.split(',').str[0].str.split(' / ').str[-1]
+                                 + ' ' + pd.Series(np.arange(1, n_restaurants + 1)).astype(str),
+                         'price_level_combined': price,
+                         'user_ratings_total': reviews,
+                         'combined_rating': rating,
+                         'geometry.location.lat': cluster_lat[cluster] + rng.normal(0, 0.0012, n_restaurants),
+                         'geometry.location.lng': cluster_lng[cluster] + rng.normal(0, 0.0016, n_restaurants),
+                         'combined_main_category': main_category,
+                         'sub_category': sub_category,
+                         'district': districts[district],
+                         'district_cluster': cluster + 1,
+                         'combined_main_category_2': main_category_2})
+
+    df_cluster_centers = pd.DataFrame({'district_cluster': np.arange(1, n_clusters + 1),
+                                       'cluster_center_lat': cluster_lat,
+                                       'cluster_center_lng': cluster_lng})
+
+    df_district = pd.DataFrame({'district': np.concatenate([['All'], districts]),
+                                'district_lat': np.concatenate([[district_lat.mean()], district_lat]),
+                                'district_lng': np.concatenate([[district_lng.mean()], district_lng])})
+
+    return data, df_cluster_centers, df_district
+
+def write_city(directory, data, df_cluster_centers, df_district):
+    """
+    Writes a city under directory with the file names of data/, returns the paths of the three files
+    """
+    paths = [os.path.join(directory, os.path.basename(path))
+             for path in (path_data, path_cluster_centers, path_district)]
+    os.makedirs(directory, exist_ok=True)
+    for df, path in zip((data, df_cluster_centers, df_district), paths):
+        # the files of data/ start with a byte order mark
+        df.to_csv(path, index=False, encoding='utf-8-sig')
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description='Generates a synthetic city with the schema of data/')
+    parser.add_argument('directory')
+    parser.add_argument('--restaurants', type=int, default=100000)
+    parser.add_argument('--districts', type=int, default=10)
+    parser.add_argument('--clusters', type=int, default=36)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    city = generate_city(args.restaurants, args.districts, args.clusters, args.seed)
+    for path in write_city(args.directory, *city):
+        print(path)
+
+if __name__ == '__main__':
+    main()
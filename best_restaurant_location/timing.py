@@ -0,0 +1,95 @@
+import contextvars
+import json
+import logging
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Timings of the rerun running in the current thread, None when timing is off
+current = contextvars.ContextVar('timings', default=None)
+
+
+class Timings:
+    """
+    Wall time, rows processed and payload bytes of the timed spans of one rerun, in start order
+    depth is the nesting level of a span inside other spans
+    With memory, spans also record peak_bytes, the peak traced memory above the memory in use when
+    they started. tracemalloc traces every thread, so only measure one rerun at a time
+    """
+    def __init__(self, memory=False):
+        self.records = []
+        self.depth = 0
+        self.memory = memory
+        # absolute traced peaks of the open spans, innermost last
+        self.peaks = []
+
+def start(memory=False):
+    """
+    Starts collecting the spans of the current thread and returns their Timings
+    memory requires tracemalloc to be tracing
+    """
+    timings = Timings(memory)
+    current.set(timings)
+    return timings
+
+def stop():
+    """
+    Stops collecting and returns the Timings collected since start(), or None
+    """
+    timings = current.get()
+    current.set(None)
+    return timings
+
+@contextmanager
+def span(stage, rows=None):
+    """
+    Times the block as stage, yielding its record so the block can fill in rows and bytes
+    Costs a context variable lookup when timing is off
+    """
+    timings = current.get()
+    record = {'stage': stage, 'ms': None, 'rows': rows, 'bytes': None}
+    if timings is None:
+        yield record
+        return
+
+    record['depth'] = timings.depth
+    timings.records.append(record)
+    timings.depth += 1
+    if timings.memory:
+        start_bytes, peak = tracemalloc.get_traced_memory()
+        # the peak so far belongs to the enclosing span, the peak of this one starts from here
+        if timings.peaks:
+            timings.peaks[-1] = max(timings.peaks[-1], peak)
+        tracemalloc.reset_peak()
+        timings.peaks.append(start_bytes)
+    start_time = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['ms'] = round((time.perf_counter() - start_time) * 1000, 3)
+        timings.depth -= 1
+        if timings.memory:
+            peak = max(timings.peaks.pop(), tracemalloc.get_traced_memory()[1])
+            record['peak_bytes'] = peak - start_bytes
+            if timings.peaks:
+                timings.peaks[-1] = max(timings.peaks[-1], peak)
+
+def log_timings(timings, **context):
+    """
+    Emits one json log line per span, with context (e.g. the selection) added to every line
+    """
+    for record in timings.records:
+        logger.info(json.dumps({'event': 'stage_timing', **context, **record}, ensure_ascii=False))
+
+def setup_logging():
+    """
+    Sends the info logs of the package (stage timings, warm-up progress) to stderr
+    """
+    package_logger = logging.getLogger('best_restaurant_location')
+    if not package_logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s %(name)s %(levelname)s %(message)s'))
+        package_logger.addHandler(handler)
+        package_logger.setLevel(logging.INFO)
@@ -0,0 +1,112 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from best_restaurant_location.cache import shared_cache
+from best_restaurant_location.params import dict_slider1, dict_slider2, default_city, map_renderer, path_access_log, \
+    warmup_top, warmup_log_bytes
+from best_restaurant_location.pipeline import Pipeline
+from best_restaurant_location.singleflight import flights
+from best_restaurant_location.stages import dict_map_builders, live, load_stage, filter_stage, map_view, \
+    restaurant_map_stage, location_map_stage
+
+logger = logging.getLogger(__name__)
+
+# Weights of the three sliders left on 'neutral'
+default_weights = (dict_slider2['neutral'], dict_slider1['neutral'], dict_slider2['neutral'])
+
+# Progress of the warm-up of this process, read by the app
+status = {'state': 'idle', 'done': 0, 'total': 0, 'current': None, 'seconds': None}
+lock = threading.Lock()
+
+
+def popular_selections(path, n, city=default_city, max_bytes=warmup_log_bytes):
+    """
+    Returns the n (district, main category, sub category) selections of city found most often in the last
+    max_bytes of the access log, which keeps growing with the server
+    Entries written before the log had a city are selections of the default city
+    """
+    if not os.path.isfile(path):
+        return []
+
+    counts = Counter()
+    with open(path, 'rb') as f:
+        start = max(os.fstat(f.fileno()).st_size - max_bytes, 0)
+        f.seek(start)
+        if start > 0:
+            # skips the line cut by the start of the tail
+            f.readline()
+        for line in f:
+            try:
+                entry = json.loads(line)
+                if entry.get('city', default_city) != city:
+                    continue
+                counts[(entry['district'], entry['main'], entry['sub'])] += 1
+            except (json.JSONDecodeError, UnicodeDecodeError, KeyError):
+                # skips a line still being written or written by another version
+                continue
+    return [selection for selection, count in counts.most_common(n)]
+
+def warm_selections(city):
+    """
+    Returns the selections warmed up for a city: 'All', then the most popular ones of the access log
+    """
+    selections = [('All', 'All', 'All')]
+    return selections + [s for s in popular_selections(path_access_log, warmup_top, city) if s not in selections]
+
+def warm_selection(dataset, selection):
+    """
+    Computes the filtered data, the maps and the default scoring of selection into the shared cache
+    Returns False for a selection the menu of the dataset does not offer, e.g. one of an older version of the log
+    """
+    district, main, sub = selection
+    if district not in dataset.config['menu'].get(main, {}).get(sub, {}):
+        return False
+    # every selection gets its own pipeline state, the state only remembers one result per stage
+    pipeline = Pipeline({}, shared_cache, flights, live)
+    df = filter_stage(pipeline, dataset, selection)
+    location, zoom = map_view(dataset.districts, district)
+    if map_renderer == 'folium':
+        for name in dict_map_builders:
+            restaurant_map_stage(pipeline, dataset, name, df, selection, location, zoom)
+    location_map_stage(pipeline, dataset, selection, default_weights, location, zoom)
+    return True
+
+def warm_up():
+    """
+    Warms up the selections of the default city, read from the access log on this thread
+    Only the default city is warmed up, the other cities are loaded when a session first selects them
+    """
+    start = time.perf_counter()
+    selections = warm_selections(default_city)
+    status['total'] = len(selections)
+    dataset = load_stage(Pipeline({}, shared_cache, flights, live), default_city)
+
+    for selection in selections:
+        status['current'] = selection
+        try:
+            warm_selection(dataset, selection)
+        except Exception:
+            logger.exception('warm-up of %s failed', selection)
+        status['done'] += 1
+        logger.info('warm-up %d/%d %s', status['done'], status['total'], selection)
+
+    status['current'] = None
+    status['seconds'] = time.perf_counter() - start
+    status['state'] = 'done'
+    logger.info('warm-up of %d selections done in %.1f s', status['total'], status['seconds'])
+
+def start_warmup():
+    """
+    Starts the warm-up on a background thread, once per process
+    Returns False if it already started
+    """
+    with lock:
+        if status['state'] != 'idle':
+            return False
+        status['state'] = 'running'
+    threading.Thread(target=warm_up, name='warmup', daemon=True).start()
+    return True
@@ -0,0 +1,106 @@
+"""
+Hot reload of new versions of the data: a background thread checks the manifest and the bundles of every
+city. A new version is compiled when the city is served from a bundle, then loaded and warmed up in the
+shared cache while the old one keeps serving. It is then swapped in the registry and the cache entries of
+the old version are dropped. Sessions keep the results they show and read the new version on their next rerun
+"""
+import logging
+import threading
+import time
+
+from best_restaurant_location.cache import shared_cache
+from best_restaurant_location.cities import city_bundles, city_paths
+from best_restaurant_location.dataset import bundle_matches, compile_bundle, current_bundle, prune_bundles, \
+    source_stats
+from best_restaurant_location.params import bundle_chunksize, reload_seconds
+from best_restaurant_location.registry import bundle_source, csv_source
+from best_restaurant_location.stages import drop_data, load_source, registry
+from best_restaurant_location.warmup import warm_selection, warm_selections
+
+logger = logging.getLogger(__name__)
+
+# Checks and reloads of this process, read by the app
+status = {'state': 'idle', 'checks': 0, 'reloads': 0, 'last_reload': None}
+lock = threading.Lock()
+
+
+def next_source(city, checked):
+    """
+    Returns the source of the data of city as it is on disk, or None when it is the current one
+    A city served from a bundle gets its bundle compiled when its files changed since the last check,
+    checked keeps the stats of the files of every city seen by the checks
+    """
+    current = registry.current(city)
+    paths = city_paths().get(city)
+    if paths is None:
+        # the city lost its files, it keeps serving the version it has
+        return None
+    if current['bundle'] is None:
+        source = csv_source(city, paths)
+    else:
+        bundles = city_bundles(city)
+        bundle = current_bundle(bundles)
+        stats = source_stats(paths)
+        if checked.get(city) != stats and (bundle is None or not bundle_matches(bundle, paths)):
+            bundle = compile_bundle(paths, bundles, bundle_chunksize)
+        checked[city] = stats
+        source = bundle_source(city, paths, bundle)
+    return None if source['key'] == current['key'] else source
+
+def reload(city, source):
+    """
+    Swaps in the new source of city. A city loaded in the shared cache has the new version loaded and its
+    popular selections warmed up first, so the sessions find them ready. The other cities are only switched
+    The bundles of the city no process holds anymore are then pruned
+    """
+    start = time.perf_counter()
+    old = registry.current(city)
+    selections = 0
+    if shared_cache.entry_size(('load', old['key'])) is not None:
+        dataset = shared_cache.put(('load', source['key']), load_source(source))
+        for selection in warm_selections(city):
+            try:
+                selections += warm_selection(dataset, selection)
+            except Exception:
+                logger.exception('warm-up of %s %s failed', city, selection)
+    registry.swap(city, source)
+    dropped = drop_data(shared_cache, {old['key']})
+    pruned = prune_bundles(city_bundles(city)) if old['bundle'] is not None else []
+
+    status['reloads'] += 1
+    status['last_reload'] = {'city': city, 'key': repr(source['key']), 'selections': selections,
+                             'dropped': dropped, 'pruned': len(pruned),
+                             'seconds': round(time.perf_counter() - start, 2)}
+    logger.info('reloaded %s: %s', city, status['last_reload'])
+
+def check(checked):
+    """
+    Checks every city once, reloading the ones with a new version
+    """
+    for city in list(registry.sources):
+        try:
+            source = next_source(city, checked)
+            if source is not None:
+                reload(city, source)
+        except Exception:
+            # e.g. a manifest published before its files were copied, the next check tries again
+            logger.exception('reload of %s failed', city)
+    status['checks'] += 1
+
+def watch():
+    checked = {}
+    while True:
+        time.sleep(reload_seconds)
+        check(checked)
+
+def start_watcher():
+    """
+    Starts the watcher on a background thread, once per process
+    Returns False if it already started or BRL_RELOAD=0
+    """
+    with lock:
+        if status['state'] != 'idle' or reload_seconds <= 0:
+            return False
+        status['state'] = 'running'
+    threading.Thread(target=watch, name='watcher', daemon=True).start()
+    return True
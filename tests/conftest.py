@@ -0,0 +1,77 @@
+import os
+import tracemalloc
+
+import pytest
+
+from best_restaurant_location.dataset import build
+from best_restaurant_location.maps import restaurant_popup_html
+from best_restaurant_location.params import path_data, path_cluster_centers, path_district
+from best_restaurant_location.scoring import load_data
+from best_restaurant_location.sqlstore import SQLiteDataset, write_sqlite
+from best_restaurant_location.synthetic import generate_city
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Representative selections (district, main category, sub category)
+SELECTIONS = {'all': ('All', 'All', 'All'),
+              'district': ('Cité-Centre', 'All', 'All'),
+              'cuisine': ('All', 'Asian', 'Thai')}
+
+# Sliders left on 'neutral'
+WEIGHTS = (2, 2, 2)
+
+# Numbers of restaurants of the synthetic cities of the scaling benchmarks, e.g. BRL_BENCH_SIZES=1000,1000000
+CITY_SIZES = [int(n) for n in os.environ.get('BRL_BENCH_SIZES', '1000,10000,100000').split(',')]
+
+
+@pytest.fixture(scope='session')
+def geneva():
+    """
+    data, df_cluster_centers and df_district of data/
+    """
+    return load_data(os.path.join(ROOT, path_data),
+                     os.path.join(ROOT, path_cluster_centers),
+                     os.path.join(ROOT, path_district))
+
+@pytest.fixture(scope='session')
+def dataset(geneva):
+    """
+    Dataset of data/, with its indexes, cube and hulls
+    """
+    return build(*geneva, version='test')
+
+@pytest.fixture(scope='session')
+def store(dataset, tmp_path_factory):
+    """
+    SQLiteDataset of data/, written to a temporary database
+    """
+    path = str(tmp_path_factory.mktemp('sqlite') / 'restaurants.sqlite')
+    write_sqlite(dataset, path)
+    return SQLiteDataset(path, dataset.cluster_centers, dataset.districts, dataset.hulls, dataset.config, 'test')
+
+@pytest.fixture(params=list(SELECTIONS), ids=list(SELECTIONS))
+def selection(request):
+    return SELECTIONS[request.param]
+
+@pytest.fixture(scope='session', params=CITY_SIZES, ids=[f'{n}' for n in CITY_SIZES])
+def city(request):
+    """
+    data, df_cluster_centers and df_district of a synthetic city, with the popup html computed like load_data
+    """
+    data, df_cluster_centers, df_district = generate_city(request.param)
+    data['popup_html'] = restaurant_popup_html(data)
+    return data, df_cluster_centers, df_district
+
+@pytest.fixture
+def peak_memory(benchmark):
+    """
+    Calls a function once with tracemalloc on and stores its peak memory in the benchmark json
+    """
+    def measure(function, *args):
+        tracemalloc.start()
+        try:
+            function(*args)
+            benchmark.extra_info['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return measure
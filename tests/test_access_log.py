@@ -0,0 +1,86 @@
+import json
+import time
+
+import pytest
+
+from best_restaurant_location.access_log import AccessLog, read_log, report
+from best_restaurant_location.warmup import popular_selections
+
+
+def entry(sub, stages):
+    return {'time': 0, 'city': 'Geneva', 'district': 'All', 'main': 'Asian', 'sub': sub, 'weights': [2, 2, 2],
+            'ms': 12.5, 'stages': stages}
+
+def wait_lines(path, n, timeout=5):
+    """
+    Waits for the writer thread to have written n lines to path
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if path.exists() and len(path.read_text(encoding='utf-8').splitlines()) >= n:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f'{path} does not have {n} lines')
+
+def test_writer_appends_json_lines(tmp_path):
+    path = tmp_path / 'logs' / 'access.jsonl'
+    log = AccessLog(str(path))
+    for sub in ['Thai', 'Japanese', 'Indian']:
+        log.write(entry(sub, []))
+    wait_lines(path, 3)
+    lines = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert [line['sub'] for line in lines] == ['Thai', 'Japanese', 'Indian']
+
+def test_read_log(tmp_path):
+    path = tmp_path / 'access.jsonl'
+    stages = [{'stage': 'filter', 'outcome': 'hit', 'ms': 1.0},
+              {'stage': 'map_location', 'outcome': 'computed', 'ms': 10.0}]
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(entry('Thai', stages)) + '\n')
+        f.write('{"truncated\n')
+        # written before the log had a city
+        old = entry('Japanese', stages[:1])
+        del old['city']
+        f.write(json.dumps(old) + '\n')
+
+    df = read_log(str(path))
+    assert df['stage'].tolist() == ['filter', 'map_location', 'filter']
+    assert df['sub'].tolist() == ['Thai', 'Thai', 'Japanese']
+    assert df['city'].tolist() == ['Geneva'] * 3
+    assert df['weights'].iloc[0] == (2, 2, 2)
+
+def test_report_hit_rates(tmp_path):
+    path = tmp_path / 'access.jsonl'
+    with open(path, 'w', encoding='utf-8') as f:
+        for outcome in ['computed', 'hit', 'coalesced', 'session', 'session', 'hit']:
+            f.write(json.dumps(entry('Thai', [{'stage': 'filter', 'outcome': outcome, 'ms': 1.0}])) + '\n')
+
+    stages = report(str(path))['stages']
+    assert stages.loc['filter', ['session', 'hit', 'coalesced', 'computed']].tolist() == [2, 2, 1, 1]
+    assert stages.loc['filter', 'session_rate'] == pytest.approx(2 / 6)
+    # reruns that kept the result of their session are not lookups of the shared cache
+    assert stages.loc['filter', 'hit_rate'] == pytest.approx(3 / 4)
+
+def test_report_errors(tmp_path):
+    with pytest.raises(FileNotFoundError, match='no access log'):
+        report(str(tmp_path / 'missing.jsonl'))
+    path = tmp_path / 'access.jsonl'
+    path.write_text('', encoding='utf-8')
+    with pytest.raises(ValueError, match='no entries'):
+        report(str(path))
+    path.write_text(json.dumps({'district': 'All'}) + '\n', encoding='utf-8')
+    with pytest.raises(ValueError, match='has no stages'):
+        report(str(path))
+
+def test_popular_selections_read_the_tail_of_the_log(tmp_path):
+    path = tmp_path / 'access.jsonl'
+    old = [json.dumps(entry('Thai', [])) for _ in range(50)]
+    new = [json.dumps(entry(sub, [])) for sub in ['Japanese', 'Japanese', 'Indian']]
+    path.write_text('\n'.join(old + new) + '\n', encoding='utf-8')
+
+    assert popular_selections(str(path), 2, 'Geneva')[0] == ('All', 'Asian', 'Thai')
+    # the tail cuts the last old line in half, which is skipped
+    tail = len('\n'.join(new)) + 20
+    assert popular_selections(str(path), 2, 'Geneva', max_bytes=tail) == [('All', 'Asian', 'Japanese'),
+                                                                          ('All', 'Asian', 'Indian')]
+    assert popular_selections(str(tmp_path / 'missing.jsonl'), 2, 'Geneva') == []
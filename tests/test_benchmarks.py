@@ -0,0 +1,125 @@
+import itertools
+import os
+
+import pytest
+
+from benchmarks.imports import DEFERRED_MODULES, import_times
+
+from best_restaurant_location.chunked import write_bundle_chunked
+from best_restaurant_location.dataset import config_of
+from best_restaurant_location.maps import base_map, create_convexhull_polygon, render_map
+from best_restaurant_location.params import compact_maps, path_data, path_cluster_centers, path_district
+from best_restaurant_location.scoring import filter_data, filter_data_scoring, merge_data, score_data, \
+    pick_location
+from best_restaurant_location.stages import dict_map_builders, map_view
+
+from tests.conftest import ROOT, WEIGHTS
+
+
+def test_filter_data(benchmark, geneva, selection):
+    data, df_cluster_centers, df_district = geneva
+    df = benchmark(filter_data, data, *selection)
+    assert 0 < len(df) <= len(data)
+
+def test_filter_data_scoring(benchmark, geneva, selection):
+    data, df_cluster_centers, df_district = geneva
+    df = benchmark(filter_data_scoring, data, *selection)
+    assert df['district_cluster'].is_unique
+
+def test_merge_data(benchmark, geneva, selection):
+    data, df_cluster_centers, df_district = geneva
+    df = benchmark(merge_data, data, *selection)
+    assert 'all_restaurants' in df.columns
+
+def test_score_data(benchmark, geneva, selection):
+    data, df_cluster_centers, df_district = geneva
+    df = benchmark(score_data, data, *selection, *WEIGHTS, df_cluster_centers)
+    assert df['score'].between(0, 1).all()
+
+def test_pick_location(benchmark, geneva, selection):
+    data, df_cluster_centers, df_district = geneva
+    best_locations, worst_locations = benchmark(pick_location, data, *selection, *WEIGHTS, df_cluster_centers)
+    assert len(best_locations) == len(worst_locations) > 0
+
+def test_dataset_filter(benchmark, geneva, dataset, selection):
+    df = benchmark(dataset.filter, *selection)
+    assert df['place_id'].tolist() == filter_data(geneva[0], *selection)['place_id'].tolist()
+
+def test_dataset_pick_location(benchmark, geneva, dataset, selection):
+    data, df_cluster_centers, df_district = geneva
+    best_locations, worst_locations = benchmark(pick_location, dataset.data, *selection, *WEIGHTS,
+                                                dataset.cluster_centers, dataset.aggregate)
+    expected = pick_location(data, *selection, *WEIGHTS, df_cluster_centers)[0]
+    assert best_locations['district_cluster'].tolist() == expected['district_cluster'].tolist()
+
+def test_sqlite_filter(benchmark, geneva, store, selection):
+    df = benchmark(store.filter, *selection)
+    assert df['place_id'].tolist() == filter_data(geneva[0], *selection)['place_id'].tolist()
+
+def test_sqlite_pick_location(benchmark, geneva, store, selection):
+    data, df_cluster_centers, df_district = geneva
+    best_locations, worst_locations = benchmark(pick_location, store.data, *selection, *WEIGHTS,
+                                                store.cluster_centers, store.aggregate)
+    expected = pick_location(data, *selection, *WEIGHTS, df_cluster_centers)[0]
+    assert best_locations['district_cluster'].tolist() == expected['district_cluster'].tolist()
+
+def test_compile_chunked(benchmark, dataset, tmp_path):
+    """
+    Compiles the bundle of data/ 500 restaurants at a time, tests/test_chunked.py checks the bundle
+    """
+    paths = [os.path.join(ROOT, path) for path in (path_data, path_cluster_centers, path_district)]
+    directories = (str(tmp_path / f'{i}') for i in itertools.count())
+    stats = benchmark.pedantic(lambda: write_bundle_chunked(paths, next(directories), 'test', chunksize=500),
+                               rounds=3)
+    assert stats['rows'] == len(dataset.data)
+
+def test_config_of(benchmark, dataset):
+    """
+    Compiles the config of data/, tests/test_bundles.py checks it
+    """
+    categories = {column: index[0] for column, index in dataset.indexes.items()}
+    benchmark(config_of, categories, dataset.cube, dataset.districts)
+
+def test_create_convexhull_polygon(benchmark, geneva):
+    data, df_cluster_centers, df_district = geneva
+    cluster = data['district_cluster'].value_counts().index[0]
+    points = data[data['district_cluster']==cluster][['geometry.location.lat', 'geometry.location.lng']].to_numpy()
+    location, zoom = map_view(df_district, 'All')
+
+    map_object = benchmark(lambda: create_convexhull_polygon(base_map(location, zoom), points, 'Best Locations',
+                                                             'green', 'green', 1, 'popup'))
+    assert 'polygon' in render_map(map_object)
+
+@pytest.mark.parametrize('name', list(dict_map_builders))
+def test_build_map(benchmark, geneva, selection, name):
+    """
+    Builds and serializes a restaurant map, folium only builds the map's html when rendering it
+    """
+    data, df_cluster_centers, df_district = geneva
+    df = filter_data(data, *selection)
+    location, zoom = map_view(df_district, selection[0])
+
+    html = benchmark(lambda: render_map(dict_map_builders[name](df, location, zoom, compact_maps)))
+    assert html.startswith('<!DOCTYPE html>')
+
+def test_filter_data_scaling(benchmark, peak_memory, city):
+    data, df_cluster_centers, df_district = city
+    peak_memory(filter_data, data, 'All', 'Asian', 'Thai')
+    df = benchmark(filter_data, data, 'All', 'Asian', 'Thai')
+    assert 0 < len(df) < len(data)
+
+@pytest.mark.parametrize('rest_category_main, rest_category', [('All', 'All'), ('Asian', 'Thai')],
+                         ids=['all', 'cuisine'])
+def test_pick_location_scaling(benchmark, peak_memory, city, rest_category_main, rest_category):
+    data, df_cluster_centers, df_district = city
+    args = (data, 'All', rest_category_main, rest_category, *WEIGHTS, df_cluster_centers)
+    peak_memory(pick_location, *args)
+    best_locations, worst_locations = benchmark(pick_location, *args)
+    assert len(best_locations) == len(worst_locations) == 5
+
+def test_import_stages(benchmark):
+    """
+    Imports the stages of the app in a fresh interpreter, the heavy modules must stay deferred
+    """
+    df, loaded = benchmark.pedantic(import_times, args=(['best_restaurant_location.stages'],), rounds=5)
+    assert not loaded & set(DEFERRED_MODULES)
@@ -0,0 +1,62 @@
+import multiprocessing
+import os
+
+from best_restaurant_location.dataset import compile_bundle, config_codes, current_bundle, hold_bundle, \
+    load_bundle, prune_bundles, write_bundle
+from best_restaurant_location.params import path_data, path_cluster_centers, path_district
+from best_restaurant_location.scoring import filter_data
+from best_restaurant_location.synthetic import generate_city, write_city
+from tests.conftest import ROOT
+
+PATHS = [os.path.join(ROOT, path) for path in (path_data, path_cluster_centers, path_district)]
+
+
+def test_config_round_trip(geneva, dataset, tmp_path):
+    """
+    The config.json of a bundle reads back as the config build compiles: every selection of its menu has
+    the restaurants it counts, and its codes select the restaurants of its district and categories
+    """
+    write_bundle(dataset, str(tmp_path / 'bundle'), PATHS)
+    config = load_bundle(str(tmp_path / 'bundle')).config
+    assert config == dataset.config
+
+    data = geneva[0]
+    for main, subs in config['menu'].items():
+        for sub, districts in subs.items():
+            for district, restaurants in districts.items():
+                assert len(filter_data(data, district, main, sub)) == restaurants
+
+    codes = config_codes(config)
+    for column in ['district', 'combined_main_category_2']:
+        for value, value_codes in codes[column].items():
+            assert dataset.data[column].cat.categories[value_codes].tolist() == [value]
+
+def test_concurrent_compilations(tmp_path):
+    """
+    Processes compiling the same version at once all get the bundle, and leave no temporary directory
+    """
+    bundles = str(tmp_path / 'bundles')
+    with multiprocessing.get_context('spawn').Pool(3) as pool:
+        directories = pool.starmap(compile_bundle, [(PATHS, bundles, 500)] * 3)
+    assert len(set(directories)) == 1
+    assert current_bundle(bundles) == directories[0]
+    assert sorted(os.listdir(bundles)) == ['CURRENT', os.path.basename(directories[0])]
+
+def test_prune_bundles(tmp_path):
+    """
+    Only the bundles that are neither current nor held are pruned, with the directories of dead compilations
+    """
+    bundles = str(tmp_path / 'bundles')
+    versions = [compile_bundle(PATHS, bundles)]
+    for seed in (1, 2):
+        paths = write_city(str(tmp_path / f'city{seed}'), *generate_city(300, seed=seed))
+        versions.append(compile_bundle(paths, bundles))
+    os.makedirs(os.path.join(bundles, '.v.1.dead.tmp'))
+    open(os.path.join(bundles, '.v.1.dead.tmp', '.lock'), 'w').close()
+
+    lock = hold_bundle(versions[0])
+    assert prune_bundles(bundles) == [os.path.join(bundles, '.v.1.dead.tmp'), versions[1]]
+    assert prune_bundles(bundles) == []
+    lock.close()
+    assert prune_bundles(bundles) == [versions[0]]
+    assert current_bundle(bundles) == versions[2]
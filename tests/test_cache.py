@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from best_restaurant_location.cache import LRUCache, sizeof
+
+
+def test_sizeof():
+    assert sizeof('été') == 5
+    assert sizeof(b'abc') == 3
+    assert sizeof(np.zeros(10)) == 80
+    assert sizeof((np.zeros(2), 'ab')) == 18
+    df = pd.DataFrame({'a': ['x' * 100] * 10})
+    assert sizeof(df) == df.memory_usage(index=True, deep=True).sum()
+
+def test_put_get_and_byte_accounting():
+    cache = LRUCache(max_bytes=100)
+    assert cache.put('a', 'x' * 40) == 'x' * 40
+    cache.put('b', 'y' * 30)
+    assert cache.bytes == 70
+    assert cache.entry_size('a') == 40
+    assert cache.get('a') == 'x' * 40
+    assert cache.get('missing') is None
+    stats = cache.stats()
+    assert (stats['entries'], stats['hits'], stats['misses']) == (2, 1, 1)
+
+    # replacing an entry accounts for its new size only
+    cache.put('a', 'z' * 10)
+    assert cache.bytes == 40
+    assert cache.entry_size('a') == 10
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(max_bytes=100)
+    cache.put('a', 'x' * 40)
+    cache.put('b', 'y' * 40)
+    cache.get('a')
+    cache.put('c', 'z' * 40)
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.bytes == 80
+    assert cache.evictions == 1
+
+def test_value_larger_than_cache_is_not_stored():
+    cache = LRUCache(max_bytes=10)
+    cache.put('a', 'x' * 5)
+    assert cache.put('b', 'y' * 20) == 'y' * 20
+    assert cache.get('b') is None
+    assert cache.get('a') == 'x' * 5
+    assert cache.bytes == 5
+
+def test_evict_idle_and_drop():
+    cache = LRUCache(max_bytes=1000)
+    cache.put(('load', 'geneva'), 'x')
+    cache.put(('load', 'lausanne'), 'y')
+    cache.put(('filter', ('lausanne', 'All')), 'z')
+    cache.used[('load', 'lausanne')] -= 100
+    assert cache.evict_idle('load', 50) == [('load', 'lausanne')]
+    assert cache.drop(lambda key: key[1][0] == 'lausanne') == 1
+    assert [key for key, size in cache.entry_sizes()] == [('load', 'geneva')]
+    assert cache.bytes == 1
@@ -0,0 +1,51 @@
+import os
+
+import pandas as pd
+
+from best_restaurant_location.chunked import write_bundle_chunked
+from best_restaurant_location.dataset import build_from_csv, load_bundle
+from best_restaurant_location.params import path_data, path_cluster_centers, path_district
+from tests.conftest import ROOT, SELECTIONS
+
+
+def test_chunked_bundle(dataset, tmp_path):
+    """
+    The bundle of data/ compiled 500 restaurants at a time answers like the dataset built at once
+    """
+    paths = [os.path.join(ROOT, path) for path in (path_data, path_cluster_centers, path_district)]
+    stats = write_bundle_chunked(paths, str(tmp_path / 'bundle'), 'test', chunksize=500)
+    assert stats['rows'] == len(dataset.data)
+
+    bundle = load_bundle(str(tmp_path / 'bundle'))
+    assert bundle.config == dataset.config
+    assert bundle.hulls.keys() == dataset.hulls.keys()
+    for cluster, form in dataset.hulls.items():
+        assert sorted(map(tuple, bundle.hulls[cluster])) == sorted(map(tuple, form))
+    pd.testing.assert_frame_equal(bundle.districts, dataset.districts, check_dtype=False)
+    for selection in SELECTIONS.values():
+        assert bundle.filter(*selection)['place_id'].tolist() == dataset.filter(*selection)['place_id'].tolist()
+
+def test_flat_clusters_across_chunks(tmp_path):
+    """
+    A cluster whose restaurants share one address, and one whose restaurants are on one line, have no hull
+    in the chunked bundle either, while their restaurants are read over several chunks
+    """
+    data = pd.read_csv(os.path.join(ROOT, path_data))
+    same, line = data['district_cluster'].value_counts().index[:2]
+    data.loc[data['district_cluster'] == same, ['geometry.location.lat', 'geometry.location.lng']] = [46.2, 6.14]
+    on_line = data['district_cluster'] == line
+    data.loc[on_line, 'geometry.location.lat'] = 46.21
+    data.loc[on_line, 'geometry.location.lng'] = 6.1 + 0.001 * (data.index[on_line] % 7)
+    assert data.index[data['district_cluster'] == same].max() >= 200
+    assert data.index[on_line].max() >= 200
+
+    paths = [str(tmp_path / 'data.csv'), os.path.join(ROOT, path_cluster_centers), os.path.join(ROOT, path_district)]
+    data.to_csv(paths[0], index=False)
+    write_bundle_chunked(paths, str(tmp_path / 'bundle'), 'test', chunksize=200)
+
+    hulls = load_bundle(str(tmp_path / 'bundle')).hulls
+    expected = build_from_csv(*paths).hulls
+    assert same not in hulls and line not in hulls
+    assert hulls.keys() == expected.keys()
+    for cluster, form in expected.items():
+        assert sorted(map(tuple, hulls[cluster])) == sorted(map(tuple, form))
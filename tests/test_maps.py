@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from best_restaurant_location.maps import COORD_SCALE, CompactPoints, classify, convex_hull, delta_encode
+from best_restaurant_location.params import dict_bins
+
+
+def test_classify_rating_boundaries():
+    """
+    A rating of 4.0 is 'Average' and 4.5 is 'High', the edges belong to the bin above them
+    """
+    df = pd.DataFrame({'combined_rating': [3.99, 4.0, 4.49, 4.5, 5.0]})
+    assert classify(df, dict_bins['rating']).tolist() == [0, 1, 1, 2, 2]
+
+def test_classify_price_and_reviews_boundaries():
+    df = pd.DataFrame({'price_level_combined': [2.0, 3.0, 4.0]})
+    assert classify(df, dict_bins['price']).tolist() == [0, 1, 2]
+    df = pd.DataFrame({'user_ratings_total': [49, 50, 150, 249, 250]})
+    assert classify(df, dict_bins['reviews']).tolist() == [0, 1, 2, 2, 3]
+
+def test_classify_missing_values():
+    df = pd.DataFrame({'combined_rating': [np.nan, 4.2, None]})
+    assert classify(df, dict_bins['rating']).tolist() == [-1, 1, -1]
+
+def test_delta_encode_round_trip():
+    lat = [46.20494053, 46.21, 46.19999, 46.19999, 46.25]
+    lng = [6.14225418, 6.1, 6.16, 6.16, 6.0]
+    points = CompactPoints(lat, lng, ['a', 'b', 'c', 'd', 'e'])
+
+    decoded_lat = np.cumsum(points.lat) / COORD_SCALE
+    decoded_lng = np.cumsum(points.lng) / COORD_SCALE
+    # coordinates are quantized to 1 / COORD_SCALE degrees, about a meter
+    assert np.abs(decoded_lat - lat).max() <= 0.5 / COORD_SCALE
+    assert np.abs(decoded_lng - lng).max() <= 0.5 / COORD_SCALE
+    assert points.popups == ['a', 'b', 'c', 'd', 'e']
+
+def test_delta_encode_integers():
+    encoded = delta_encode([46.2, 46.20001, 46.2])
+    assert encoded == [4620000, 1, -1]
+    assert delta_encode([]) == []
+
+def test_convex_hull_of_flat_points():
+    """
+    Points without an area have no hull instead of failing in qhull
+    """
+    assert convex_hull(np.array([[46.2, 6.1]] * 5)) is None
+    assert convex_hull(np.array([[46.2, 6.1], [46.2, 6.2], [46.2, 6.3], [46.2, 6.1]])) is None
+    assert convex_hull(np.array([[46.2, 6.1], [46.2, 6.2]])) is None
+    assert len(convex_hull(np.array([[46.2, 6.1], [46.3, 6.1], [46.2, 6.2], [46.22, 6.12]]))) == 3
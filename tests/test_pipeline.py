@@ -0,0 +1,165 @@
+import threading
+
+import pytest
+
+from best_restaurant_location.cache import LRUCache
+from best_restaurant_location.pipeline import Pipeline
+from best_restaurant_location.singleflight import SingleFlight
+
+
+class Stop(BaseException):
+    """
+    Stands for the exceptions streamlit raises to stop or rerun a script
+    """
+
+def follow(flights, key, compute, results):
+    """
+    Starts a caller of flights.do on a thread, its result or error lands in results
+    """
+    def run():
+        try:
+            results.append(flights.do(key, compute))
+        except BaseException as error:
+            results.append(error)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+def wait_coalesced(flights, n):
+    while flights.stats()['coalesced'] < n:
+        threading.Event().wait(0.001)
+
+def test_singleflight_shares_one_computation():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return 'value'
+
+    results = []
+    leader = follow(flights, 'a', compute, results)
+    started.wait()
+    followers = [follow(flights, 'a', compute, results) for _ in range(3)]
+    wait_coalesced(flights, 3)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(results, key=lambda result: result[1]) == [('value', False)] * 3 + [('value', True)]
+    assert flights.stats() == {'in_flight': 0, 'coalesced': 3}
+
+def test_singleflight_raises_errors_to_followers():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def compute():
+        started.set()
+        release.wait()
+        raise ValueError('bad data')
+
+    results = []
+    leader = follow(flights, 'a', compute, results)
+    started.wait()
+    follower = follow(flights, 'a', compute, results)
+    wait_coalesced(flights, 1)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert [type(result) for result in results] == [ValueError, ValueError]
+
+def test_singleflight_followers_retry_a_stopped_leader():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def stopped():
+        started.set()
+        release.wait()
+        raise Stop()
+
+    results = []
+    leader = follow(flights, 'a', stopped, results)
+    started.wait()
+    follower = follow(flights, 'a', lambda: 'value', results)
+    wait_coalesced(flights, 1)
+    release.set()
+    leader.join()
+    follower.join()
+
+    # the follower computed the value itself instead of returning None
+    assert isinstance(results[0], Stop)
+    assert results[1] == ('value', True)
+    assert flights.stats()['in_flight'] == 0
+
+def test_pipeline_outcomes():
+    cache = LRUCache(max_bytes=10 ** 6)
+    state = {}
+    pipeline = Pipeline(state, cache, SingleFlight())
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return 'value'
+
+    assert pipeline.stage('filter', 1, compute) == 'value'
+    assert pipeline.stage('filter', 1, compute) == 'value'
+    # a new session finds the result of the first one in the shared cache
+    other = Pipeline({}, cache, SingleFlight())
+    assert other.stage('filter', 1, compute) == 'value'
+    assert pipeline.stage('filter', 2, compute) == 'value'
+    assert pipeline.stage('scores', 2, compute, shared=False) == 'value'
+
+    assert [record['outcome'] for record in pipeline.log] == ['computed', 'session', 'computed', 'computed']
+    assert [record['outcome'] for record in other.log] == ['hit']
+    assert len(calls) == 3
+    assert state['filter'] == (2, 'value')
+    assert cache.entry_size(('scores', 2)) is None
+
+def test_pipeline_checks_the_cache_in_the_flight():
+    cache = LRUCache(max_bytes=10 ** 6)
+    pipeline = Pipeline({}, cache, SingleFlight())
+    get = cache.get
+
+    def get_then_store(key):
+        # another session stores the result right after this one missed it
+        value = get(key)
+        cache.put(key, 'stored')
+        return value
+
+    cache.get = get_then_store
+    assert pipeline.stage('filter', 1, lambda: pytest.fail('computed twice')) == 'stored'
+    assert pipeline.log[0]['outcome'] == 'hit'
+    assert cache.stats()['misses'] == 1
+
+def test_pipeline_keeps_no_result_of_a_failed_stage():
+    cache = LRUCache(max_bytes=10 ** 6)
+    state = {}
+    pipeline = Pipeline(state, cache, SingleFlight())
+
+    def fail():
+        raise Stop()
+
+    with pytest.raises(Stop):
+        pipeline.stage('filter', 1, fail)
+    assert 'filter' not in state
+    assert cache.entry_size(('filter', 1)) is None
+    assert pipeline.stage('filter', 1, lambda: 'value') == 'value'
+
+def test_pipeline_keeps_results_of_retired_data_out_of_cache():
+    cache = LRUCache(max_bytes=10 ** 6)
+    retired = set()
+    pipeline = Pipeline({}, cache, SingleFlight(), live=lambda key: key[0] not in retired)
+
+    assert pipeline.stage('filter', ('v1', 'All'), lambda: 'old') == 'old'
+    assert cache.entry_size(('filter', ('v1', 'All'))) is not None
+    # a rerun still holding the dataset of v1 after v1 was swapped out and its entries dropped
+    retired.add('v1')
+    cache.drop(lambda entry: entry[1][0] == 'v1')
+    assert pipeline.stage('map_overview', ('v1', 'All'), lambda: 'old map') == 'old map'
+    assert pipeline.state['map_overview'] == (('v1', 'All'), 'old map')
+    assert cache.stats()['entries'] == 0
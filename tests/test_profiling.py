@@ -0,0 +1,19 @@
+import os
+
+from best_restaurant_location import profiling
+
+
+def test_stop_keeps_the_last_profiles(tmp_path):
+    for i in range(3):
+        path = tmp_path / f'old{i}.prof'
+        path.write_bytes(b'')
+        os.utime(path, (i, i))
+    (tmp_path / 'notes.txt').write_text('kept', encoding='utf-8')
+
+    profiler = profiling.start()
+    try:
+        path = profiling.stop(profiler, str(tmp_path), 'All_Asian_Thai', keep=2)
+    finally:
+        profiling.release(profiler)
+    assert sorted(os.listdir(tmp_path)) == sorted(['notes.txt', 'old2.prof', os.path.basename(path)])
+    assert not profiling.lock.locked()
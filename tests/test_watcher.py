@@ -0,0 +1,108 @@
+import os
+import shutil
+
+import pytest
+
+from best_restaurant_location import registry as registry_module, stages, warmup, watcher
+from best_restaurant_location.cache import LRUCache
+from best_restaurant_location.cities import manifest_paths, publish
+from best_restaurant_location.dataset import compile_bundle, current_bundle
+from best_restaurant_location.pipeline import Pipeline
+from best_restaurant_location.registry import Registry
+from best_restaurant_location.singleflight import SingleFlight
+from best_restaurant_location.stages import filter_stage, live, load_stage
+from best_restaurant_location.synthetic import generate_city, write_city
+
+CITY = 'Testville'
+ALL = ('All', 'All', 'All')
+
+
+@pytest.fixture
+def city(tmp_path, monkeypatch):
+    """
+    Publishes v1 of a city of 500 restaurants, compiled into its bundle, and makes the city the only one
+    of a registry and a shared cache of its own
+    Returns the directory of the city, the directory of its bundles and the shared cache
+    """
+    directory = str(tmp_path / 'cities' / CITY)
+    bundles = str(tmp_path / 'bundles' / CITY)
+    write_city(directory, *generate_city(500, seed=0))
+    publish(directory, 'v1')
+    compile_bundle(manifest_paths(directory), bundles)
+
+    monkeypatch.setattr(registry_module, 'city_bundles', lambda name: bundles)
+    monkeypatch.setattr(watcher, 'city_bundles', lambda name: bundles)
+    monkeypatch.setattr(watcher, 'city_paths', lambda: {CITY: manifest_paths(directory)})
+    registry = Registry({CITY: manifest_paths(directory)})
+    monkeypatch.setattr(stages, 'registry', registry)
+    monkeypatch.setattr(watcher, 'registry', registry)
+    cache = LRUCache(max_bytes=2 ** 30)
+    monkeypatch.setattr(watcher, 'shared_cache', cache)
+    monkeypatch.setattr(warmup, 'shared_cache', cache)
+    monkeypatch.setattr(watcher, 'warm_selections', lambda name: [ALL])
+    return directory, bundles, cache
+
+def publish_version(directory, tmp_path, version, n):
+    """
+    Copies the files of a new city of n restaurants next to the others and points the manifest to them
+    """
+    paths = write_city(str(tmp_path / version), *generate_city(n, seed=n))
+    files = {}
+    for name, path in zip(['data', 'cluster_centers', 'district'], paths):
+        files[name] = f'{name}_{version}.csv'
+        shutil.copy(path, os.path.join(directory, files[name]))
+    publish(directory, version, **files)
+
+def data_entries(cache, key):
+    """
+    Returns the cache entries of the data of key, like stages.drop_data finds them
+    """
+    return [entry for entry in cache.entries
+            if entry[1] == key or (isinstance(entry[1], tuple) and entry[1][0] == key)]
+
+def test_reload_swaps_in_the_new_version(city, tmp_path):
+    directory, bundles, cache = city
+    pipeline = Pipeline({}, cache, SingleFlight(), live)
+    dataset = load_stage(pipeline, CITY)
+    assert len(filter_stage(pipeline, dataset, ALL)) == 500
+    old = stages.registry.current(CITY)
+    assert old['key'] == dataset.key == current_bundle(bundles)
+
+    checked = {}
+    watcher.check(checked)
+    assert stages.registry.current(CITY) is old
+
+    publish_version(directory, tmp_path, 'v2', 600)
+    watcher.check(checked)
+    new = stages.registry.current(CITY)
+    assert new['key'] == new['bundle'] == current_bundle(bundles) != old['key']
+    assert watcher.status['last_reload']['pruned'] == 1
+
+    # the old version left the cache and its bundle was pruned, the new one is loaded and warmed up
+    assert data_entries(cache, old['key']) == []
+    assert not os.path.isdir(old['bundle'])
+    assert len(data_entries(cache, new['key'])) >= 2
+    new_pipeline = Pipeline({}, cache, SingleFlight(), live)
+    assert len(filter_stage(new_pipeline, load_stage(new_pipeline, CITY), ALL)) == 600
+    assert [record['outcome'] for record in new_pipeline.log] == ['hit', 'hit']
+
+    # a session still holding the dataset of v1 keeps reading it, without storing anything in the cache
+    assert len(dataset.filter(*ALL)) == 500
+    assert len(filter_stage(pipeline, dataset, ('All', 'Asian', 'All'))) > 0
+    assert data_entries(cache, old['key']) == []
+
+def test_failed_reload_keeps_the_current_version(city, tmp_path):
+    directory, bundles, cache = city
+    current = stages.registry.current(CITY)
+    reloads = watcher.status['reloads']
+
+    with open(os.path.join(directory, 'data_v2.csv'), 'w', encoding='utf-8') as f:
+        f.write('not,the,data\n1,2,3\n')
+    publish(directory, 'v2', data='data_v2.csv')
+    watcher.check({})
+
+    assert stages.registry.current(CITY) is current
+    assert watcher.status['reloads'] == reloads
+    assert current_bundle(bundles) == current['bundle']
+    pipeline = Pipeline({}, cache, SingleFlight(), live)
+    assert len(filter_stage(pipeline, load_stage(pipeline, CITY), ALL)) == 500